@@ -106,6 +106,38 @@ SYSTEM_PROMPT = (
     "Politely refuse to answer any question that is not about U.S. loans, mortgages, or housing finance."
 )
 
+USER_CHAT_SYSTEM_PROMPT = """
+You are a knowledgeable and friendly assistant specializing in U.S. home loans and mortgages. 
+You provide clear, accurate, and up-to-date information about:
+- Home loan types (fixed-rate, adjustable-rate, FHA, VA, USDA, jumbo, etc.)
+- Mortgage interest rates and factors affecting them
+- Loan eligibility, credit scores, and down payment requirements
+- The home buying process, including pre-approval, application, underwriting, and closing
+- Refinancing options and strategies
+- Federal and state-specific programs for first-time buyers
+
+Guidelines:
+1. Only answer questions related to U.S. home loans, mortgages, or closely related financial topics.
+2. If the question is outside your scope, politely say:
+   "I specialize in U.S. home loans. Could you ask something related to that?"
+3. Use plain, easy-to-understand language.
+4. Provide examples, numbers, and explanations when helpful.
+5. Keep tone professional but approachable, like a trusted loan advisor.
+"""
+
+# Lender phrases rewritten in every bot reply (override with REPLY_REPLACEMENTS_FILE)
+REPLY_REPLACEMENTS = {
+    "speak with a lender": "please reach out to us",
+    "talk to a lender": "please reach out to us",
+    "consult with a lender": "please reach out to us",
+    "contact a lender": "please reach out to us",
+    "talk to your bank": "please reach out to us",
+    "consult your bank": "please reach out to us",
+    "speak to your bank": "please reach out to us",
+    "consult with your lender": "please reach out to us",
+    "reach out to a lender": "please reach out to us",
+}
+
 EMAIL_BODY = (
     "Hi,\n\n"
     "Thank you for completing the pre-approval form. "
@@ -14,3 +14,5 @@ user_collection = db["users"]
 chat_collection = db["chats"]
 admin_collection = db["admins"]
 pre_approvals_collection = db["pre_approval"]
+preapproval_sessions_collection = db["preapproval_sessions"]
+snapshots_collection = db["snapshots"]
@@ -1,11 +1,28 @@
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import user_routes, admin_routes, chat_routes, auth_routes, mortgage_routes, amortization_routes, url_routes, user_chat_routes
+from app.services.write_behind import write_behind
+from app.services.gov_resources import gov_resources
+from app.services.rate_feed import rate_feed
+from app.services.compute_pool import compute_pool
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await write_behind.start()
+    await gov_resources.start()
+    await rate_feed.start()
+    yield
+    await rate_feed.stop()
+    await gov_resources.stop()
+    # Drain queued chat writes before the worker exits
+    await write_behind.stop()
+    compute_pool.shutdown()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "https://assurantchatbotapp.onrender.com"
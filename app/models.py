@@ -1,4 +1,19 @@
-from pydantic import BaseModel
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Optional, Union
+
+from app.services.extra_payments import MONTHS
+
+
+def check_month(month):
+    """Month names Jan-Dec or numbers 1-12; anything else would be read as January"""
+    if month in MONTHS or (isinstance(month, int) and 1 <= month <= 12):
+        return month
+    raise ValueError("month must be Jan-Dec or 1-12")
+
+
+# Month fields of extra payment requests
+Month = Annotated[Union[str, int], AfterValidator(check_month)]
+MonthName = Annotated[str, AfterValidator(check_month)]
 
 class User(BaseModel):
     name: str
@@ -31,3 +46,15 @@ class PreApprovalRequest(BaseModel):
     email: str
     income: str
     property_value: str
+
+class ExtraPaymentRule(BaseModel):
+    """Recurring extra payment: every N months from a start month, optionally escalating and ending"""
+    amount: float = Field(0, ge=0)
+    fromMonth: Month = "Jan"
+    fromYear: int = 2025
+    everyMonths: int = Field(1, ge=1)
+    annualIncreasePercent: float = 0
+    untilMonth: Optional[Month] = None
+    untilYear: Optional[int] = None
+    # Bi-weekly equivalent: adds 1/12 of the scheduled payment each month (amount is ignored)
+    biweekly: bool = False
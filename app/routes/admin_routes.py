@@ -3,6 +3,10 @@ from typing import List
 from app.models import AdminLogin, User, Chat
 from app.database import admin_collection, user_collection, chat_collection
 from app.utils import verify_password, create_access_token
+from app.services.conversation_memory import chat_memory, user_chat_memory
+from app.services.answer_cache import answer_cache
+from app.services.write_behind import write_behind
+from app.services.result_cache import result_cache
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -16,6 +20,25 @@ def get_user_history(email: str):
     chats = list(chat_collection.find({"email": email}, {"_id": 0}))
     return chats
 
+@router.get("/chat-memory-stats")
+def get_chat_memory_stats():
+    return {
+        "chat": chat_memory.stats(),
+        "user_chat": user_chat_memory.stats()
+    }
+
+@router.get("/answer-cache-stats")
+def get_answer_cache_stats():
+    return answer_cache.stats()
+
+@router.get("/write-behind-stats")
+def get_write_behind_stats():
+    return write_behind.stats()
+
+@router.get("/result-cache-stats")
+def get_result_cache_stats():
+    return result_cache.stats()
+
 @router.post("/login")
 def admin_login(credentials: AdminLogin):
     admin = admin_collection.find_one({"email": credentials.email})
@@ -1,29 +1,62 @@
 
-from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, HTTPException, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime, timedelta
+import os
+import io
+import csv
+import json
+import itertools
+from functools import partial
 import math
 import calendar
 
+import numpy as np
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import orjson
+except ImportError:  # optional fast serializer
+    orjson = None
+
+from app.models import ExtraPaymentRule, MonthName
+from app.services.amortization_engine import amortize, amortize_cents, LoanTimeline
+from app.services.result_cache import result_cache, canonical_hash, etag_for, etag_matches, not_modified
+from app.services.what_if import PaymentPlan, plan_store
+from app.services.scenario_grid import SCENARIO_GRID_MAX_SIZE, compile_plans, run_scenarios
+from app.services.refinance import REFINANCE_MAX_CANDIDATES, evaluate_refinance
+
 router =APIRouter()
 
+# "numpy" (default), "loop" for the month-by-month reference implementation
+# or "cents" for integer-cent arithmetic with servicer rounding
+AMORTIZATION_ENGINE = os.getenv("AMORTIZATION_ENGINE", "numpy")
+# Accept header value that selects the columnar response
+COLUMNAR_MEDIA_TYPE = "application/vnd.amortization.columnar+json"
+# Payments rendered per chunk of a streamed export
+EXPORT_CHUNK_PAYMENTS = 120
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 
 class ExtraPaymentDetails(BaseModel):
     amount: float = 0
-    fromMonth: str = "Jan"
+    fromMonth: MonthName = "Jan"
     fromYear: int = 2025
 
 class OneTimePayment(BaseModel):
     amount: float = 0
-    month: str = "Jan"
+    month: MonthName = "Jan"
     year: int = 2025
 
 class ExtraPayments(BaseModel):
     monthly: ExtraPaymentDetails = ExtraPaymentDetails()
     yearly: ExtraPaymentDetails = ExtraPaymentDetails()
     oneTime: List[OneTimePayment] = []
+    rules: List[ExtraPaymentRule] = []
 
 class LoanRequest(BaseModel):
     loanAmount: float
@@ -63,9 +96,132 @@ class AmortizationResult(BaseModel):
     payoffDate: str
     schedule: List[PaymentScheduleItem]
     yearlySchedule: List[YearlyScheduleItem]
+
+class RollupItem(BaseModel):
+    year: int
+    quarter: Optional[int] = None
+    beginningBalance: float
+    totalPayments: float
+    totalPrincipal: float
+    totalInterest: float
+    totalExtraPayments: float
+    endingBalance: float
+    cumulativeInterest: float
+
+class RollupResult(BaseModel):
+    monthlyPayment: float
+    totalPayments: float
+    totalInterest: float
+    payoffDate: str
+    period: str
+    rollup: List[RollupItem]
+
+class ScheduleWindow(BaseModel):
+    monthlyPayment: float
+    totalPaymentCount: int
     payoffDate: str
     schedule: List[PaymentScheduleItem]
 
+class ScenarioGridRequest(BaseModel):
+    base: LoanRequest
+    # Each empty axis falls back to the base request's value
+    interestRates: List[float] = []
+    loanTerms: List[int] = []
+    # Down payments are taken off homePrice (the base loan amount if not given)
+    homePrice: Optional[float] = None
+    downPayments: List[float] = []
+    extraPaymentPlans: List[ExtraPayments] = []
+
+class ScenarioGridResult(BaseModel):
+    """Matrices are nested lists indexed [interestRate][loanTerm][downPayment][extraPaymentPlan]"""
+    interestRates: List[float]
+    loanTerms: List[int]
+    downPayments: List[float]
+    extraPaymentPlans: int
+    shape: List[int]
+    loanAmount: List[Any]
+    monthlyPayment: List[Any]
+    totalInterest: List[Any]
+    totalPayments: List[Any]
+    payoffDate: List[Any]
+    interestSaved: List[Any]
+
+class PlanSummary(BaseModel):
+    monthlyPayment: float
+    finalScheduledPayment: float
+    totalPayments: float
+    totalInterest: float
+    paymentCount: int
+    payoffDate: Optional[str]
+
+class PlanDiff(BaseModel):
+    firstChangedPayment: Optional[int]
+    interestDelta: float
+    totalPaymentsDelta: float
+    paymentCountDelta: int
+    scheduledPaymentDelta: float
+
+class WhatIfRequest(BaseModel):
+    handle: str
+    type: Literal["extra", "rate", "recast"]
+    paymentNumber: int
+    amount: float = 0
+    interestRate: Optional[float] = None
+    # For "extra": repeat the amount on every later payment as well
+    recurring: bool = False
+    includeSchedule: bool = False
+
+class WhatIfResult(BaseModel):
+    handle: str
+    summary: PlanSummary
+    diff: Optional[PlanDiff] = None
+    # Rows from the first changed payment on, when requested
+    schedule: Optional[List[PaymentScheduleItem]] = None
+
+class RefinanceCandidate(BaseModel):
+    name: Optional[str] = None
+    interestRate: float
+    loanTerm: int
+    # Percent of the new loan amount
+    points: float = 0
+    closingCosts: float = 0
+    # Finance points and closing costs instead of paying them at closing
+    rollInCosts: bool = False
+
+class RefinanceRequest(BaseModel):
+    currentBalance: float
+    currentInterestRate: float
+    remainingMonths: int
+    candidates: List[RefinanceCandidate]
+    # Annual percent used to discount monthly savings for the NPV
+    discountRate: float = 0
+    includeCumulativeSavings: bool = True
+
+class RefinanceCandidateResult(BaseModel):
+    name: Optional[str]
+    newLoanAmount: float
+    monthlyPayment: float
+    monthlySavings: float
+    upfrontCost: float
+    # First month cumulative savings cover the upfront cost; None if they never do
+    breakEvenMonth: Optional[int]
+    interestDelta: float
+    lifetimeSavings: float
+    npv: float
+    cumulativeSavings: Optional[List[float]] = None
+
+class RefinanceResult(BaseModel):
+    currentMonthlyPayment: float
+    currentRemainingInterest: float
+    candidates: List[RefinanceCandidateResult]
+
+class BalanceAtPayment(BaseModel):
+    paymentNumber: int
+    paymentDate: str
+    endingBalance: float
+    cumulativeInterest: float
+    paidOff: bool
+
 def calculate_monthly_payment(loan_amount: float, annual_rate: float, term_years: int) -> float:
     """Calculate monthly payment using standard amortization formula"""
     if annual_rate == 0:
@@ -87,50 +243,59 @@ def get_month_number(month_name: str) -> int:
     }
     return months.get(month_name, 1)
 
-def calculate_extra_payment(payment_date: datetime, extra_payments: ExtraPayments, payment_number: int) -> float:
-    """Calculate extra payment for a given payment date"""
+def calculate_extra_payment(payment_date: datetime, extra_payments: ExtraPayments, scheduled_payment: float) -> float:
+    """
+    Extra payment for a given payment date, evaluated from the request on its own.
+
+    The reference loop uses this rather than the compiled calendar the
+    engines share, so comparing the two also checks the calendar.
+    """
     if not extra_payments:
         return 0.0
-    
+
     total_extra = 0.0
     current_year = payment_date.year
     current_month = payment_date.month
-    
-    print(f"Calculating extra payment for date: {payment_date}, payment #{payment_number}")
-    
+    current_index = current_year * 12 + current_month - 1
+
     # Monthly extra payments
     if extra_payments.monthly and extra_payments.monthly.amount > 0:
         from_month = get_month_number(extra_payments.monthly.fromMonth)
         from_year = extra_payments.monthly.fromYear
-        
-        print(f"Monthly extra: ${extra_payments.monthly.amount} from {extra_payments.monthly.fromMonth} {from_year}")
-        
-        if (current_year > from_year or 
+        if (current_year > from_year or
             (current_year == from_year and current_month >= from_month)):
             total_extra += extra_payments.monthly.amount
-            print(f"Applied monthly extra: ${extra_payments.monthly.amount}")
-    
+
     # Yearly extra payments (applied once per year in specified month)
     if extra_payments.yearly and extra_payments.yearly.amount > 0:
         yearly_month = get_month_number(extra_payments.yearly.fromMonth)
         yearly_from_year = extra_payments.yearly.fromYear
-        
-        print(f"Yearly extra: ${extra_payments.yearly.amount} in {extra_payments.yearly.fromMonth} from {yearly_from_year}")
-        
         if (current_year >= yearly_from_year and current_month == yearly_month):
             total_extra += extra_payments.yearly.amount
-            print(f"Applied yearly extra: ${extra_payments.yearly.amount}")
-    
+
     # One-time extra payments
-    if extra_payments.oneTime:
-        for one_time in extra_payments.oneTime:
-            if (one_time.amount > 0 and
-                one_time.year == current_year and
-                get_month_number(one_time.month) == current_month):
-                total_extra += one_time.amount
-                print(f"Applied one-time extra: ${one_time.amount} for {one_time.month} {one_time.year}")
-    
-    print(f"Total extra payment: ${total_extra}")
+    for one_time in extra_payments.oneTime or []:
+        if (one_time.amount > 0 and
+            one_time.year == current_year and
+            get_month_number(one_time.month) == current_month):
+            total_extra += one_time.amount
+
+    # Rules: every N months from a start month, optionally escalating and ending
+    for rule in extra_payments.rules or []:
+        amount = scheduled_payment / 12 if rule.biweekly else rule.amount
+        if amount <= 0:
+            continue
+        from_month = rule.fromMonth if isinstance(rule.fromMonth, int) else get_month_number(rule.fromMonth)
+        months_since_start = current_index - (rule.fromYear * 12 + from_month - 1)
+        if months_since_start < 0 or months_since_start % rule.everyMonths:
+            continue
+        if rule.untilYear:
+            until_month = rule.untilMonth or 12
+            until_month = until_month if isinstance(until_month, int) else get_month_number(until_month)
+            if current_index > rule.untilYear * 12 + until_month - 1:
+                continue
+        total_extra += amount * (1 + rule.annualIncreasePercent / 100) ** (months_since_start // 12)
+
     return total_extra
 
 def generate_yearly_schedule(monthly_schedule: List[PaymentScheduleItem]) -> List[YearlyScheduleItem]:
@@ -138,8 +303,8 @@ def generate_yearly_schedule(monthly_schedule: List[PaymentScheduleItem]) -> Lis
     yearly_data = {}
     
     for payment in monthly_schedule:
-        payment_date = datetime.strptime(payment.paymentDate, "%Y-%m-%d")
-        year = payment_date.year
+        # paymentDate is always YYYY-MM-DD; no need to parse the whole date
+        year = int(payment.paymentDate[:4])
         
         if year not in yearly_data:
             yearly_data[year] = {
@@ -176,7 +341,11 @@ def generate_amortization_schedule(
     start_year: int,
     extra_payments: ExtraPayments
 ) -> AmortizationResult:
-    """Generate complete amortization schedule with extra payments"""
+    """
+    Generate complete amortization schedule with extra payments, one month at a time.
+
+    Kept as the reference implementation for generate_amortization_schedule_vectorized.
+    """
     
     monthly_payment = calculate_monthly_payment(loan_amount, annual_rate, term_years)
     monthly_rate = annual_rate / 100 / 12
@@ -198,7 +367,7 @@ def generate_amortization_schedule(
         principal_payment = min(monthly_payment - interest_payment, current_balance)
         
         # Add extra payment if specified
-        extra_payment = calculate_extra_payment(current_date, extra_payments, payment_number)
+        extra_payment = calculate_extra_payment(current_date, extra_payments, monthly_payment)
         
         # Apply extra payment to principal
         if extra_payment > 0:
@@ -265,44 +434,185 @@ def generate_amortization_schedule(
 
 
 
+def generate_amortization_schedule_vectorized(
+    loan_amount: float,
+    annual_rate: float,
+    term_years: int,
+    start_date: str,
+    start_month: str,
+    start_year: int,
+    extra_payments: ExtraPayments,
+    exact: bool = False
+) -> AmortizationResult:
+    """
+    Same result as generate_amortization_schedule, computed with the NumPy engine,
+    or with the integer-cent engine when `exact` is set
+    """
+    schedule = (amortize_cents if exact else amortize)(
+        loan_amount=loan_amount,
+        annual_rate=annual_rate,
+        term_years=term_years,
+        start_month=get_month_number(start_month),
+        start_year=start_year,
+        extra_payments=extra_payments
+    )
+
+    return AmortizationResult(
+        monthlyPayment=schedule.monthly_payment,
+        totalPayments=schedule.total_payments,
+        totalInterest=schedule.total_interest,
+        payoffDate=schedule.payoff_date() or start_date,
+        schedule=schedule.rows(),
+        yearlySchedule=schedule.yearly_rows()
+    )
+
+
+def validate_loan_request(request: LoanRequest) -> None:
+    """Raise a 400 for loan parameters the schedule cannot be built from"""
+    if request.loanAmount <= 0:
+        raise HTTPException(status_code=400, detail="Loan amount must be positive")
+    
+    if request.interestRate < 0:
+        raise HTTPException(status_code=400, detail="Interest rate cannot be negative")
+    
+    if request.loanTerm <= 0:
+        raise HTTPException(status_code=400, detail="Loan term must be positive")
+    
+    # Validate date format if provided
+    if request.startDate:
+        try:
+            datetime.strptime(request.startDate, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+
+def resolve_grid(grid: ScenarioGridRequest) -> tuple:
+    """
+    (rates, terms, down_payments, plans, home_price) of a scenario grid, each
+    empty axis filled from the base request; raises a 400 for grids that are
+    too large or contain a scenario the schedule cannot be built from
+    """
+    base = grid.base
+    validate_loan_request(base)
+    rates = grid.interestRates or [base.interestRate]
+    terms = grid.loanTerms or [base.loanTerm]
+    down_payments = grid.downPayments or [0.0]
+    plans = grid.extraPaymentPlans or [base.extraPayments or ExtraPayments()]
+    size = len(rates) * len(terms) * len(down_payments) * len(plans)
+    if size > SCENARIO_GRID_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Scenario grid has {size} combinations; the limit is {SCENARIO_GRID_MAX_SIZE}")
+    if min(rates) < 0 or min(terms) <= 0:
+        raise HTTPException(status_code=400, detail="Interest rates cannot be negative and loan terms must be positive")
+    home_price = grid.homePrice if grid.homePrice is not None else base.loanAmount
+    if home_price - max(down_payments) <= 0:
+        raise HTTPException(status_code=400, detail="Every down payment must leave a positive loan amount")
+    return rates, terms, down_payments, plans, home_price
+
+
+def loan_timeline(request: LoanRequest) -> LoanTimeline:
+    return LoanTimeline(
+        loan_amount=request.loanAmount,
+        annual_rate=request.interestRate,
+        term_years=request.loanTerm,
+        start_month=get_month_number(request.startMonth or "Jan"),
+        start_year=request.startYear or 2025,
+        extra_payments=request.extraPayments or ExtraPayments()
+    )
+
+
+def dumps(content) -> bytes:
+    """Compact JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+def wants_columnar(format: Optional[str], accept: Optional[str]) -> bool:
+    if format:
+        return format == "columnar"
+    return bool(accept) and COLUMNAR_MEDIA_TYPE in accept
+
+
+def columnar_amortization_body(request: LoanRequest, start_date: str, decimals: Optional[int],
+                               exact: bool = False) -> bytes:
+    """
+    Amortization result with each schedule field as one array:
+    {"schedule": {"paymentNumber": [...], "principal": [...], ...}, ...}
+    """
+    schedule = (amortize_cents if exact else amortize)(
+        loan_amount=request.loanAmount,
+        annual_rate=request.interestRate,
+        term_years=request.loanTerm,
+        start_month=get_month_number(request.startMonth or "Jan"),
+        start_year=request.startYear or 2025,
+        extra_payments=request.extraPayments or ExtraPayments()
+    )
+    totals = (schedule.monthly_payment, schedule.total_payments, schedule.total_interest)
+    if decimals is not None:
+        totals = tuple(round(value, decimals) for value in totals)
+    monthly_payment, total_payments, total_interest = totals
+
+    content = {
+        "monthlyPayment": monthly_payment,
+        "totalPayments": total_payments,
+        "totalInterest": total_interest,
+        "payoffDate": schedule.payoff_date() or start_date,
+        "schedule": schedule.columns(decimals),
+        "yearlySchedule": schedule.yearly_columns(decimals)
+    }
+    return dumps(content)
+
+
 @router.post("/amortize-calculate", response_model=AmortizationResult)
-async def calculate_amortization(request: LoanRequest):
+async def calculate_amortization(
+    request: LoanRequest,
+    format: Optional[str] = Query(None, pattern="^(rows|columnar)$", description="columnar returns one array per schedule field"),
+    cents: bool = Query(False, description="Round amounts to cents (columnar format only)"),
+    engine: Optional[Literal["numpy", "loop", "cents"]] = Query(
+        None, description="cents computes in integer cents with per-payment rounding; defaults to AMORTIZATION_ENGINE"
+    ),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
     """Calculate amortization schedule based on loan parameters"""
     
     try:
-        print(f"Received request: {request}")  # Debug logging
-        print(f"Extra payments: {request.extraPayments}")  # Debug extra payments
-        
-        # Validate inputs
-        if request.loanAmount <= 0:
-            raise HTTPException(status_code=400, detail="Loan amount must be positive")
-        
-        if request.interestRate < 0:
-            raise HTTPException(status_code=400, detail="Interest rate cannot be negative")
-        
-        if request.loanTerm <= 0:
-            raise HTTPException(status_code=400, detail="Loan term must be positive")
-        
-        # Validate date format if provided
-        if request.startDate:
-            try:
-                datetime.strptime(request.startDate, "%Y-%m-%d")
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        validate_loan_request(request)
         
+        columnar = wants_columnar(format, accept)
+        engine = engine or AMORTIZATION_ENGINE
+        exact = engine == "cents"
+        cache_key = canonical_hash("amortize-calculate", request, columnar=columnar, cents=cents and columnar,
+                                   engine=engine)
+        etag = etag_for(cache_key)
+        if etag_matches(if_none_match, etag):
+            result_cache.revalidated()
+            return not_modified(etag)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        start_date = request.startDate or f"{request.startYear}-{get_month_number(request.startMonth):02d}-01"
+        if columnar:
+            body = columnar_amortization_body(request, start_date, 2 if cents else None, exact=exact)
+            return result_cache.set(cache_key, body, COLUMNAR_MEDIA_TYPE)
+
         # Generate amortization schedule
-        result = generate_amortization_schedule(
+        if engine == "loop":
+            generate = generate_amortization_schedule
+        else:
+            generate = partial(generate_amortization_schedule_vectorized, exact=exact)
+        result = generate(
             loan_amount=request.loanAmount,
             annual_rate=request.interestRate,
             term_years=request.loanTerm,
-            start_date=request.startDate or f"{request.startYear}-{get_month_number(request.startMonth):02d}-01",
+            start_date=start_date,
             start_month=request.startMonth or "Jan",
             start_year=request.startYear or 2025,
             extra_payments=request.extraPayments or ExtraPayments()
         )
         
-        print(f"Generated {len(result.schedule)} payments with total interest: ${result.totalInterest:.2f}")
-        return result
+        return result_cache.set(cache_key, dumps(result.model_dump()))
         
     except HTTPException:
         raise
@@ -312,3 +622,327 @@ async def calculate_amortization(request: LoanRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
 
+
+@router.post("/amortize-window", response_model=ScheduleWindow)
+async def amortization_window(
+    request: LoanRequest,
+    start: int = Query(1, ge=1, description="First payment number of the window"),
+    count: int = Query(60, ge=1, le=600, description="Number of payments in the window")
+):
+    """One page of the amortization schedule, computed without the payments before it"""
+    validate_loan_request(request)
+    try:
+        timeline = loan_timeline(request)
+        window = timeline.window(start, count)
+        return ScheduleWindow(
+            monthlyPayment=timeline.payment,
+            totalPaymentCount=timeline.payment_count,
+            payoffDate=timeline.payment_date(timeline.payment_count),
+            schedule=window.rows()
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+
+@router.post("/amortize-balance", response_model=BalanceAtPayment)
+async def amortization_balance(
+    request: LoanRequest,
+    payment: int = Query(..., ge=1, description="Payment number to report the balance after")
+):
+    """Remaining balance and interest paid after a given payment"""
+    validate_loan_request(request)
+    try:
+        timeline = loan_timeline(request)
+        payment = min(payment, timeline.payment_count)
+        return BalanceAtPayment(
+            paymentNumber=payment,
+            paymentDate=timeline.payment_date(payment),
+            endingBalance=timeline.balance_after(payment),
+            cumulativeInterest=timeline.interest_through(payment),
+            paidOff=payment == timeline.payment_count
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+
+@router.post("/amortize-calculate/stream")
+async def stream_amortization(request: LoanRequest, chunk: int = Query(120, ge=1, le=600)):
+    """The full schedule as NDJSON, one PaymentScheduleItem per line, built a window at a time"""
+    validate_loan_request(request)
+    timeline = loan_timeline(request)
+
+    def lines():
+        for first in range(1, timeline.payment_count + 1, chunk):
+            rows = timeline.window(first, chunk).rows()
+            yield b"".join(dumps(row) + b"\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/amortize-scenarios", response_model=ScenarioGridResult)
+async def amortization_scenarios(grid: ScenarioGridRequest):
+    """Compare every combination of rate, term, down payment and extra-payment plan in one batched pass"""
+    base = grid.base
+    rates, terms, down_payments, plans, home_price = resolve_grid(grid)
+    shape = [len(rates), len(terms), len(down_payments), len(plans)]
+
+    try:
+        rate_axis, term_axis, down_axis, plan_axis = (
+            axis.ravel() for axis in np.meshgrid(
+                np.array(rates, dtype=float), np.array(terms), np.array(down_payments, dtype=float),
+                np.arange(len(plans)), indexing="ij"
+            )
+        )
+        loan_amounts = home_price - down_axis
+        start_month = get_month_number(base.startMonth or "Jan")
+        start_year = base.startYear or 2025
+        plan_fixed, plan_per_payment = compile_plans(plans, start_month, start_year, max(terms) * 12)
+
+        results = await run_scenarios(loan_amounts, rate_axis, term_axis, plan_axis, plan_fixed, plan_per_payment)
+
+        payoff_months = start_year * 12 + start_month - 1 + results["payment_count"] - 1
+        payoff_dates = np.array([f"{m // 12:04d}-{m % 12 + 1:02d}-01" for m in payoff_months.tolist()])
+
+        def matrix(values: np.ndarray) -> list:
+            return values.reshape(shape).tolist()
+
+        content = {
+            "interestRates": rates,
+            "loanTerms": terms,
+            "downPayments": down_payments,
+            "extraPaymentPlans": len(plans),
+            "shape": shape,
+            "loanAmount": matrix(loan_amounts),
+            "monthlyPayment": matrix(results["monthly_payment"]),
+            "totalInterest": matrix(results["total_interest"]),
+            "totalPayments": matrix(results["total_payments"]),
+            "payoffDate": matrix(payoff_dates),
+            "interestSaved": matrix(results["interest_without_extras"] - results["total_interest"])
+        }
+        return Response(content=dumps(content), media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+
+@router.post("/amortize-whatif/base", response_model=WhatIfResult)
+async def create_what_if_plan(request: LoanRequest):
+    """Compute a schedule and return a handle that what-if edits build on"""
+    validate_loan_request(request)
+    plan = PaymentPlan.create(
+        loan_amount=request.loanAmount,
+        annual_rate=request.interestRate,
+        term_years=request.loanTerm,
+        start_month=get_month_number(request.startMonth or "Jan"),
+        start_year=request.startYear or 2025,
+        extra_payments=request.extraPayments or ExtraPayments()
+    )
+    return WhatIfResult(handle=plan_store.add(plan), summary=PlanSummary(**plan.summary()))
+
+
+@router.post("/amortize-whatif", response_model=WhatIfResult)
+async def what_if(edit: WhatIfRequest):
+    """
+    Apply one modification (extra payment, rate change or recast) to a plan.
+    Payments before the modified one are reused; only the rest is recomputed.
+    The result has its own handle, so edits can be chained.
+    """
+    base = plan_store.get(edit.handle)
+    if base is None:
+        raise HTTPException(status_code=404, detail="Schedule handle not found or expired; create the base plan again")
+    try:
+        plan = base.modify(edit.type, edit.paymentNumber, amount=edit.amount, annual_rate=edit.interestRate,
+                           recurring=edit.recurring)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    diff = plan.diff(base)
+    schedule = None
+    if edit.includeSchedule and diff["firstChangedPayment"] is not None:
+        schedule = plan.schedule.rows()[diff["firstChangedPayment"] - 1:]
+    return WhatIfResult(
+        handle=plan_store.add(plan),
+        summary=PlanSummary(**plan.summary()),
+        diff=PlanDiff(**diff),
+        schedule=schedule
+    )
+
+
+SCHEDULE_FIELDS = list(PaymentScheduleItem.model_fields)
+YEARLY_FIELDS = list(YearlyScheduleItem.model_fields)
+
+
+def schedule_csv_chunks(timeline: LoanTimeline, decimals: Optional[int], prefix: tuple = ()):
+    """CSV text for a schedule, one chunk of payments at a time"""
+    for first in range(1, timeline.payment_count + 1, EXPORT_CHUNK_PAYMENTS):
+        columns = timeline.window(first, EXPORT_CHUNK_PAYMENTS).columns(decimals)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(prefix + row for row in zip(*(columns[name] for name in SCHEDULE_FIELDS)))
+        yield buffer.getvalue()
+
+
+def csv_header(fields: List[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return buffer.getvalue()
+
+
+def attachment(filename: str) -> Dict[str, str]:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+@router.post("/amortize-export/csv")
+async def export_amortization_csv(request: LoanRequest, cents: bool = Query(True, description="Round amounts to cents")):
+    """Download the schedule as CSV, streamed in chunks of payments"""
+    validate_loan_request(request)
+    timeline = loan_timeline(request)
+
+    def rows():
+        yield csv_header(SCHEDULE_FIELDS)
+        yield from schedule_csv_chunks(timeline, 2 if cents else None)
+
+    return StreamingResponse(rows(), media_type="text/csv", headers=attachment("amortization_schedule.csv"))
+
+
+@router.post("/amortize-export/scenarios/csv")
+async def export_scenarios_csv(grid: ScenarioGridRequest, cents: bool = Query(True, description="Round amounts to cents")):
+    """
+    Download the schedule of every scenario in a grid as one CSV. Each row
+    starts with the scenario's rate, term, down payment and plan index.
+    Scenarios are computed one at a time while the response streams.
+    """
+    base = grid.base
+    rates, terms, down_payments, plans, home_price = resolve_grid(grid)
+    start_month = get_month_number(base.startMonth or "Jan")
+    start_year = base.startYear or 2025
+
+    def rows():
+        yield csv_header(["interestRate", "loanTerm", "downPayment", "extraPaymentPlan"] + SCHEDULE_FIELDS)
+        for rate, term, down_payment, plan_index in itertools.product(rates, terms, down_payments, range(len(plans))):
+            timeline = LoanTimeline(home_price - down_payment, rate, term, start_month, start_year, plans[plan_index])
+            yield from schedule_csv_chunks(timeline, 2 if cents else None, (rate, term, down_payment, plan_index))
+
+    return StreamingResponse(rows(), media_type="text/csv", headers=attachment("amortization_scenarios.csv"))
+
+
+def schedule_workbook(request: LoanRequest, decimals: Optional[int]) -> bytes:
+    """XLSX with a Schedule sheet and a Yearly rollup sheet"""
+    schedule = amortize(
+        loan_amount=request.loanAmount,
+        annual_rate=request.interestRate,
+        term_years=request.loanTerm,
+        start_month=get_month_number(request.startMonth or "Jan"),
+        start_year=request.startYear or 2025,
+        extra_payments=request.extraPayments or ExtraPayments()
+    )
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        pd.DataFrame(schedule.columns(decimals), columns=SCHEDULE_FIELDS).to_excel(writer, sheet_name="Schedule", index=False)
+        pd.DataFrame(schedule.yearly_columns(decimals), columns=YEARLY_FIELDS).to_excel(writer, sheet_name="Yearly", index=False)
+    return buffer.getvalue()
+
+
+@router.post("/amortize-export/xlsx")
+async def export_amortization_xlsx(request: LoanRequest, cents: bool = Query(True, description="Round amounts to cents")):
+    """Download the schedule and its yearly rollup as an Excel workbook"""
+    validate_loan_request(request)
+    try:
+        content = await run_in_threadpool(schedule_workbook, request, 2 if cents else None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
+    return Response(content=content, media_type=XLSX_MEDIA_TYPE, headers=attachment("amortization_schedule.xlsx"))
+
+
+@router.post("/amortize-rollup", response_model=RollupResult)
+async def amortization_rollup(
+    request: LoanRequest,
+    period: Literal["yearly", "quarterly"] = Query("yearly"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Totals and yearly or quarterly aggregates only, without the monthly rows"""
+    validate_loan_request(request)
+    cache_key = canonical_hash("amortize-rollup", request, period=period)
+    etag = etag_for(cache_key)
+    if etag_matches(if_none_match, etag):
+        result_cache.revalidated()
+        return not_modified(etag)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        schedule = amortize(
+            loan_amount=request.loanAmount,
+            annual_rate=request.interestRate,
+            term_years=request.loanTerm,
+            start_month=get_month_number(request.startMonth or "Jan"),
+            start_year=request.startYear or 2025,
+            extra_payments=request.extraPayments or ExtraPayments()
+        )
+        start_date = request.startDate or f"{request.startYear}-{get_month_number(request.startMonth):02d}-01"
+        content = {
+            "monthlyPayment": schedule.monthly_payment,
+            "totalPayments": schedule.total_payments,
+            "totalInterest": schedule.total_interest,
+            "payoffDate": schedule.payoff_date() or start_date,
+            "period": period,
+            "rollup": schedule.yearly_rows() if period == "yearly" else schedule.quarterly_rows()
+        }
+        return result_cache.set(cache_key, dumps(content))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
+
+
+@router.post("/amortize-refinance", response_model=RefinanceResult)
+async def refinance_break_even(request: RefinanceRequest):
+    """Break-even month, interest delta and NPV of every refinance candidate against the current loan"""
+    candidates = request.candidates
+    if request.currentBalance <= 0 or request.remainingMonths <= 0:
+        raise HTTPException(status_code=400, detail="Current balance and remaining months must be positive")
+    if not candidates or len(candidates) > REFINANCE_MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {REFINANCE_MAX_CANDIDATES} candidates")
+    if request.currentInterestRate < 0 or any(c.interestRate < 0 or c.loanTerm <= 0 for c in candidates):
+        raise HTTPException(status_code=400, detail="Interest rates cannot be negative and loan terms must be positive")
+    if any(not 0 <= c.points < 100 or c.closingCosts < 0 for c in candidates):
+        raise HTTPException(status_code=400, detail="Points must be between 0 and 100 and closing costs non-negative")
+
+    try:
+        results = evaluate_refinance(
+            balance=request.currentBalance,
+            annual_rate=request.currentInterestRate,
+            remaining_months=request.remainingMonths,
+            new_rates=np.array([c.interestRate for c in candidates], dtype=float),
+            new_term_months=np.array([c.loanTerm * 12 for c in candidates]),
+            points=np.array([c.points for c in candidates], dtype=float),
+            closing_costs=np.array([c.closingCosts for c in candidates], dtype=float),
+            roll_in_costs=np.array([c.rollInCosts for c in candidates]),
+            discount_rate=request.discountRate
+        )
+        columns = {
+            name: np.round(results[name], 2).tolist()
+            for name in ("new_loan_amount", "monthly_payment", "monthly_savings", "upfront_cost",
+                         "interest_delta", "lifetime_savings", "npv")
+        }
+        content = {
+            "currentMonthlyPayment": round(float(results["current_payment"]), 2),
+            "currentRemainingInterest": round(float(results["current_interest"]), 2),
+            "candidates": [
+                {
+                    "name": candidate.name,
+                    "newLoanAmount": columns["new_loan_amount"][i],
+                    "monthlyPayment": columns["monthly_payment"][i],
+                    "monthlySavings": columns["monthly_savings"][i],
+                    "upfrontCost": columns["upfront_cost"][i],
+                    "breakEvenMonth": int(results["break_even_month"][i]) or None,
+                    "interestDelta": columns["interest_delta"][i],
+                    "lifetimeSavings": columns["lifetime_savings"][i],
+                    "npv": columns["npv"][i],
+                    "cumulativeSavings": (
+                        np.round(results["cumulative_savings"][i], 2).tolist() if request.includeCumulativeSavings else None
+                    ),
+                }
+                for i, candidate in enumerate(candidates)
+            ]
+        }
+        return Response(content=dumps(content), media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Calculation error: {str(e)}")
@@ -1,24 +1,33 @@
 from datetime import datetime
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from collections import defaultdict
 from app.models import ChatInput
 from app.database import chat_collection, pre_approvals_collection
-from openai import AzureOpenAI, BaseModel, OpenAI
+from openai import AsyncOpenAI, AzureOpenAI, BaseModel
 import os
-import requests
-from bs4 import BeautifulSoup
+import json
 import asyncio
 import logging
 from app.pdf_generator import generate_preapproval_pdf
 from app.email_service import send_client_notification_with_attachments, send_email_with_attachment, send_email_with_multiple_attachments
 from app.pdf_generator import write_preapproval_to_sheet  
-from app.constants import PREAPPROVAL_FIELDS, SYSTEM_PROMPT, EMAIL_BODY
+from app.constants import SYSTEM_PROMPT, EMAIL_BODY
 import aiofiles 
 from typing import Optional,  List
 import uuid
 from pathlib import Path
 
+from app.services.write_behind import write_behind
+from app.services.conversation_memory import chat_memory
+from app.services.answer_cache import answer_cache, is_context_free
+from app.services.intent_router import intent_router, PREAPPROVAL, RATES, GOV_RESOURCES
+from app.services.reply_rewriter import reply_rewriter
+from app.services.gov_resources import gov_resources
+from app.services.rate_feed import rate_feed
+from app.services.session_store import chat_sessions, new_preapproval_state, SessionConflictError
+from app.services.preapproval_flow import preapproval_flow
 from app.services.docuclipper_bank_statement import (validate_bank_statement_file, 
     format_bank_statement_summary, 
     DocuClipperError,
@@ -34,8 +43,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-message_histories = defaultdict(list)
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
 
@@ -55,18 +63,16 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 ALLOWED_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-#state management
-user_states = defaultdict(lambda: {
-    "preapproval_started": False,
-    "current_question_index": -1,
-    "answers": {},
-    "uploaded_files": []
-})
 
 class ChatRequest(BaseModel):
     message: str
 
 
+def _sse(event: str, payload: dict) -> str:
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
 
 async def save_uploaded_file(file: UploadFile, user_email: str) -> dict:
     """Save uploaded file and return file info"""
@@ -89,8 +95,7 @@ async def save_uploaded_file(file: UploadFile, user_email: str) -> dict:
         
         # Generate unique filename
         unique_filename = f"{uuid.uuid4()}_{file.filename}"
-        # file_path = UPLOAD_DIR / unique_filename
-        file_path = unique_filename
+        file_path = UPLOAD_DIR / unique_filename
         # Save file
         async with aiofiles.open(file_path, 'wb') as f:
             await f.write(content)
@@ -107,7 +112,7 @@ async def save_uploaded_file(file: UploadFile, user_email: str) -> dict:
         }
         
         # Insert file info into database
-        chat_collection.insert_one({
+        await write_behind.write(chat_collection, {
             "email": user_email,
             "file_info": file_info,
             "sender": "user",
@@ -127,84 +132,6 @@ async def save_uploaded_file(file: UploadFile, user_email: str) -> dict:
 
 
 
-def get_mortgage_rates():
-    url = "https://www.mortgagenewsdaily.com/mortgage-rates"
-    response = requests.get(url)
-    print("Fetched URL status:", response.status_code)
-
-    soup = BeautifulSoup(response.content, "html.parser")
-    print("Soup created")
-
-    tables = soup.find_all("table")
-    print(f"Found {len(tables)} tables")
-    for i, table in enumerate(tables):
-        print(f"Table {i} class: {table.get('class')}")
-
-    # Updated selector based on class
-    rates = {}
-    for table in soup.find_all("table", class_="mtg-rates"):
-        rows = table.find_all("tr")
-        print(f"Found {len(rows)} rows in table.mtg-rates")
-
-        for i, row in enumerate(rows[1:], start=1):
-            cols = row.find_all("td")
-            print(f"Row {i}: {len(cols)} columns")
-
-            if len(cols) >= 2:
-                rate_type = cols[0].text.strip()
-                rate_value = cols[1].text.strip()
-                print(f"Rate Type: {rate_type}, Rate Value: {rate_value}")
-                rates[rate_type] = rate_value
-
-    print("Final rates dictionary:", rates)
-    return rates
-
-    
-def get_fannie_mae_summary():
-    url = "https://selling-guide.fanniemae.com/"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        paragraphs = soup.find_all("p")
-        text_blocks = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 80]
-        return "\n\n".join(text_blocks[:2]) if text_blocks else "No content extracted."
-    except Exception as e:
-        return f"Failed to fetch: {str(e)}"
-
-
-def get_freddie_mac_summary():
-    url = "https://guide.freddiemac.com/app/guide/browse"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        paragraphs = soup.find_all("p")
-        text_blocks = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 80]
-        return "\n\n".join(text_blocks[:2]) if text_blocks else "No content extracted."
-    except Exception as e:
-        return f"Failed to fetch: {str(e)}"
-
-
-def get_hud_fha_summary():
-    url = "https://www.hud.gov/hud-partners/single-family-fha-resource-center"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        paragraphs = soup.find_all("p")
-        text_blocks = [p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 80]
-        return "\n\n".join(text_blocks[:2]) if text_blocks else "No content extracted."
-    except Exception as e:
-        return f"Failed to fetch: {str(e)}"
-
-
-        
-
-
-
-
-
 @router.post("/chat")
 async def chat(
     input: Optional[ChatInput] = None,
@@ -218,13 +145,11 @@ async def chat(
             user_email = input.email
             user_message = input.message.strip()
             if user_message:
-                chat_collection.insert_one(input.dict())
+                await write_behind.write(chat_collection, input.dict())
         else:   
             user_email = email
             user_message = message.strip() if message else ""
-            
-            if user_email not in message_histories or not message_histories[user_email]:
-                message_histories[user_email] = [{"role": "system", "content": SYSTEM_PROMPT}]
+
             # Store chat message
             if user_message:
                 chat_data = {
@@ -233,233 +158,227 @@ async def chat(
                     "sender": "user",
                     "timestamp": datetime.utcnow()
                 }
-                chat_collection.insert_one(chat_data)
+                await write_behind.write(chat_collection, chat_data)
 
         logger.info(f"Chat request from {user_email}: {user_message}")
-        if user_email not in user_states:
-            user_states[user_email] = {
-                "preapproval_started": False,
-                "current_question_index": 0,
-                "answers": {},
-                "uploaded_files": []
-            }
-
-        state = user_states[user_email]
-        # Handle file uploads first
+        intent = intent_router.route(user_message)
         uploaded_files_info = []
-        if files:
-            for file in files:
-                if file.filename:  # Check if file was actually uploaded
-                    file_info = await save_uploaded_file(file, user_email)
-                    uploaded_files_info.append(file_info)
-                    # Add to user state
-                    state["uploaded_files"].append(file_info)
+        state = await chat_sessions.peek(user_email) or new_preapproval_state()
+        # Only uploads, wizard commands and the wizard itself open the session;
+        # other turns never write it
+        if files or user_message.lower() in ["restart", "back"] or intent == PREAPPROVAL or state["preapproval_started"]:
+            async with chat_sessions.session(user_email) as session:
+                state = session.state
+                # Handle file uploads first
+                if files:
+                    for file in files:
+                        if file.filename:  # Check if file was actually uploaded
+                            file_info = await save_uploaded_file(file, user_email)
+                            uploaded_files_info.append(file_info)
+                            # Add to user state
+                            state["uploaded_files"].append(file_info)
                     
-        # Handle restart command
-        if user_message.lower() == "restart":
-            user_states[user_email] = {
-                "preapproval_started": True,
-                "current_question_index": 0,
-                "answers": {},
-                "uploaded_files": []
-            }
-            logger.info("Pre-approval restarted")
-            return {"reply": "Pre-approval process restarted.\n\n" + PREAPPROVAL_FIELDS[0]["question"]}
-
-        # Handle back command
-        if user_message.lower() == "back" and state["preapproval_started"]:
-            state["current_question_index"] = max(state["current_question_index"] - 1, 0)
-            logger.info("Navigated back to previous question")
-            return {"reply": f"Okay, let's go back.\n{PREAPPROVAL_FIELDS[state['current_question_index']]['question']}"}
-
-        # Start pre-approval process
-        if any(keyword in user_message.lower() for keyword in ["preapproval", "pre-approval", "pre approval", "pre app", "pre-app", "preapp"]) and not state["preapproval_started"]:
-            state["preapproval_started"] = True
-            state["current_question_index"] = 0
-            # Auto-fill email immediately when starting pre-approval
-            state["answers"]["email"] = user_email
+                # Handle restart command
+                if user_message.lower() == "restart":
+                    session.reset(new_preapproval_state(started=True))
+                    logger.info("Pre-approval restarted")
+                    return {"reply": "Pre-approval process restarted.\n\n" + preapproval_flow.question(0)}
+
+                # Handle back command
+                if user_message.lower() == "back" and state["preapproval_started"]:
+                    state["current_question_index"] = max(state["current_question_index"] - 1, 0)
+                    logger.info("Navigated back to previous question")
+                    return {"reply": f"Okay, let's go back.\n{preapproval_flow.question(state['current_question_index'])}"}
+
+                # Start pre-approval process
+                if intent == PREAPPROVAL and not state["preapproval_started"]:
+                    state["preapproval_started"] = True
+                    state["current_question_index"] = 0
+                    # Auto-fill email immediately when starting pre-approval
+                    state["answers"]["email"] = user_email
             
-            # Check if first question is email field
-            if PREAPPROVAL_FIELDS[0]["key"] == "email":
-                # Show email confirmation message
-                return {"reply": f"Great! Let's begin your pre-approval process.\n\n• Your email is: {user_email}\n• Do you want to keep this email? (yes/no)"}
-            else:
-                return {"reply": f"Great! Let's begin your pre-approval process.\n\n{PREAPPROVAL_FIELDS[0]['question']}"}
+                    # Check if first question is email field
+                    if preapproval_flow.keys[0] == "email":
+                        # Show email confirmation message
+                        return {"reply": f"Great! Let's begin your pre-approval process.\n\n• Your email is: {user_email}\n• Do you want to keep this email? (yes/no)"}
+                    else:
+                        return {"reply": f"Great! Let's begin your pre-approval process.\n\n{preapproval_flow.question(0)}"}
 
-        # Handle pre-approval process
-        if state["preapproval_started"]:
-            idx = state["current_question_index"]
-            if idx >= len(PREAPPROVAL_FIELDS):
-                return {"reply": "Pre-approval process already completed!"}
+                # Handle pre-approval process
+                if state["preapproval_started"]:
+                    idx = state["current_question_index"]
+                    if idx >= len(preapproval_flow):
+                        return {"reply": "Pre-approval process already completed!"}
                 
-            field = PREAPPROVAL_FIELDS[idx]
-            key = field["key"]
-
-            # Auto-fill for email field
-            if key == "email":
-                # If email is not set in answers yet, show the confirmation
-                if not state["answers"].get("email"):
-                    state["answers"]["email"] = user_email
-                    return {"reply": f"• Your email is: {user_email}\n• Do you want to keep this email? (yes/no)"}
+                    field = preapproval_flow.field(idx)
+                    key = field["key"]
+
+                    # Auto-fill for email field
+                    if key == "email":
+                        # If email is not set in answers yet, show the confirmation
+                        if not state["answers"].get("email"):
+                            state["answers"]["email"] = user_email
+                            return {"reply": f"• Your email is: {user_email}\n• Do you want to keep this email? (yes/no)"}
                 
-                # Handle user response to email confirmation
-                if user_message.lower() in ["yes", "y"]:
-                    # Keep the pre-filled email
-                    message_histories[user_email].append({
-                        "role": "user",
-                        "content": f"[Pre-Approval Answer] email: {user_email}"
-                    })
-                    state["current_question_index"] += 1
+                        # Handle user response to email confirmation
+                        if user_message.lower() in ["yes", "y"]:
+                            # Keep the pre-filled email
+                            chat_memory.append(user_email, "user", f"[Pre-Approval Answer] email: {user_email}")
+                            state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
                     
-                    if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                        next_q = PREAPPROVAL_FIELDS[state["current_question_index"]]["question"]
-                        return {"reply": f"✅ Email kept as {user_email}.\n\n{next_q}"}
-                    else:
-                        # This shouldn't happen if email is first question, but handle it
-                        return {"reply": f"✅ Email kept as {user_email}."}
+                            if state["current_question_index"] < len(preapproval_flow):
+                                next_q = preapproval_flow.question(state["current_question_index"])
+                                return {"reply": f"✅ Email kept as {user_email}.\n\n{next_q}"}
+                            else:
+                                # This shouldn't happen if email is first question, but handle it
+                                return {"reply": f"✅ Email kept as {user_email}."}
                         
-                elif user_message.lower() in ["no", "n"]:
-                    return {"reply": "Please enter your preferred email:"}
+                        elif user_message.lower() in ["no", "n"]:
+                            return {"reply": "Please enter your preferred email:"}
                     
-                elif "@" in user_message:
-                    # User provided a different email
-                    state["answers"]["email"] = user_message
-                    message_histories[user_email].append({
-                        "role": "user",
-                        "content": f"[Pre-Approval Answer] email: {user_message}"
-                    })
-                    state["current_question_index"] += 1
+                        elif "@" in user_message:
+                            # User provided a different email
+                            state["answers"]["email"] = user_message
+                            chat_memory.append(user_email, "user", f"[Pre-Approval Answer] email: {user_message}")
+                            state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
                     
-                    if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                        next_q = PREAPPROVAL_FIELDS[state["current_question_index"]]["question"]
-                        return {"reply": f"✅ Email updated to {user_message}.\n\n{next_q}"}
-                    else:
-                        return {"reply": f"✅ Email updated to {user_message}."}
-                else:
-                    # Invalid response, ask again
-                    return {"reply": f"• Your email is: {user_email}\n• Do you want to keep this email? (yes/no)"}
-
-            # Special handling for bank_statements (file upload required)
-            elif key == "bank_statements":
-                if not uploaded_files_info and not user_message.strip():
-                    return {"reply": "❌ Error: Please upload your bank statements (PDF, JPG, or PNG files) to continue with the pre-approval process.\n\nYou can upload multiple files if needed."}
+                            if state["current_question_index"] < len(preapproval_flow):
+                                next_q = preapproval_flow.question(state["current_question_index"])
+                                return {"reply": f"✅ Email updated to {user_message}.\n\n{next_q}"}
+                            else:
+                                return {"reply": f"✅ Email updated to {user_message}."}
+                        else:
+                            # Invalid response, ask again
+                            return {"reply": f"• Your email is: {user_email}\n• Do you want to keep this email? (yes/no)"}
+
+                    # Special handling for bank_statements (file upload required)
+                    elif key == "bank_statements":
+                        if not uploaded_files_info and not user_message.strip():
+                            return {"reply": "❌ Error: Please upload your bank statements (PDF, JPG, or PNG files) to continue with the pre-approval process.\n\nYou can upload multiple files if needed."}
                 
-                if uploaded_files_info:
-                    print(f"📂 Uploaded files info: {uploaded_files_info}")
-                    #chech bannk statement
-                    for file_info in uploaded_files_info:
-                        file_path = file_info["file_path"]
-                    file_names = [f["original_filename"] for f in uploaded_files_info]
-                    state["answers"][key] = f"Files uploaded: {', '.join(file_names)}"
+                        if uploaded_files_info:
+                            print(f"📂 Uploaded files info: {uploaded_files_info}")
+                            #chech bannk statement
+                            for file_info in uploaded_files_info:
+                                file_path = file_info["file_path"]
+                            file_names = [f["original_filename"] for f in uploaded_files_info]
+                            state["answers"][key] = f"Files uploaded: {', '.join(file_names)}"
                     
-                    # message_histories[user_email].append({
-                    #     "role": "user",
-                    #     "content": f"[Pre-Approval Answer] {key}: {', '.join(file_names)}"
-                    # })
-                    # Move to next question or complete process
-                    state["current_question_index"] += 1
+                            # message_histories[user_email].append({
+                            #     "role": "user",
+                            #     "content": f"[Pre-Approval Answer] {key}: {', '.join(file_names)}"
+                            # })
+                            # Move to next question or complete process
+                            state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
                     
-                    if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                        next_question = PREAPPROVAL_FIELDS[state["current_question_index"]]["question"]
-                        return {"reply": f"✅ Thank you! I've received your bank statements: {', '.join(file_names)}\n\n{next_question}"}
+                            if state["current_question_index"] < len(preapproval_flow):
+                                next_question = preapproval_flow.question(state["current_question_index"])
+                                return {"reply": f"✅ Thank you! I've received your bank statements: {', '.join(file_names)}\n\n{next_question}"}
+                            else:
+                                # Complete pre-approval process
+                                await write_behind.write(pre_approvals_collection, {
+                                    "email": user_email,
+                                    "data": state["answers"],
+                                    "uploaded_files": state["uploaded_files"],
+                                    "submitted_at": datetime.utcnow()
+                                }, durable=True)
+
+                                # Generate PDF
+                                # pdf_path = generate_preapproval_pdf(state["answers"], user_email)
+                                #spread sheet
+                                # spreadsheet_url = write_preapproval_to_sheet(state["answers"])
+                                # Send PDF via email
+                                # send_email_with_attachment(
+                                #     to_email=user_email,
+                                #     subject="Your Pre-Approval Application",
+                                #     body=EMAIL_BODY,
+                                #     # file_path=pdf_path,
+                                # )
+                                # send_client_notification_with_attachments(
+                                #     client_email= CLIENT_EMAIL, 
+                                #     customer_email=user_email,
+                                #     preapproval_data=state["answers"],
+                                #     uploaded_files=state["uploaded_files"],
+                                # )
+
+                                session.delete()
+                                return {"reply": f"I've received your bank statements: {', '.join(file_names)}\n\n✅ Thanks! We've received your complete pre-approval application with all required documents."}
+                        else:
+                            return {"reply": "❌ Error: Bank statements are required to complete your pre-approval. Please upload your recent bank statements (PDF, JPG, or PNG files)."}
+
+                    # Handle other pre-approval questions
                     else:
-                        # Complete pre-approval process
-                        pre_approvals_collection.insert_one({
-                            "email": user_email,
-                            "data": state["answers"],
-                            "uploaded_files": state["uploaded_files"],
-                            "submitted_at": datetime.utcnow()
-                        })
-
-                        # Generate PDF
-                        # pdf_path = generate_preapproval_pdf(state["answers"], user_email)
-                        #spread sheet
-                        # spreadsheet_url = write_preapproval_to_sheet(state["answers"])
-                        # Send PDF via email
-                        # send_email_with_attachment(
-                        #     to_email=user_email,
-                        #     subject="Your Pre-Approval Application",
-                        #     body=EMAIL_BODY,
-                        #     # file_path=pdf_path,
-                        # )
-                        # send_client_notification_with_attachments(
-                        #     client_email= CLIENT_EMAIL, 
-                        #     customer_email=user_email,
-                        #     preapproval_data=state["answers"],
-                        #     uploaded_files=state["uploaded_files"],
-                        # )
-
-                        del user_states[user_email]
-                        return {"reply": f"I've received your bank statements: {', '.join(file_names)}\n\n✅ Thanks! We've received your complete pre-approval application with all required documents."}
-                else:
-                    return {"reply": "❌ Error: Bank statements are required to complete your pre-approval. Please upload your recent bank statements (PDF, JPG, or PNG files)."}
-
-            # Handle other pre-approval questions
-            else:
-                # Validate input if validation function exists
-                if "validate" in field and not field["validate"](user_message):
-                    logger.warning(f"Validation failed for {key}: {user_message}")
-                    return {"reply": f"Invalid input. Please try again.\n\n{field['question']}"}
+                        # Validate input if validation function exists
+                        if not preapproval_flow.validate(key, user_message):
+                            logger.warning(f"Validation failed for {key}: {user_message}")
+                            return {"reply": f"Invalid input. Please try again.\n\n{field['question']}"}
 
-                state["answers"][key] = user_message
-                state["current_question_index"] += 1
+                        state["answers"][key] = user_message
+                        state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
 
-                if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                    next_field = PREAPPROVAL_FIELDS[state["current_question_index"]]
-                    next_question = next_field["question"]
+                        if state["current_question_index"] < len(preapproval_flow):
+                            next_field = preapproval_flow.field(state["current_question_index"])
+                            next_question = next_field["question"]
                     
-                    # Add special instruction for bank statements
-                    if next_field["key"] == "bank_statements":
-                        next_question += "\n\n📎 Important: You must upload your bank statement files to proceed. Text responses will not be accepted for this step."
+                            # Add special instruction for bank statements
+                            if next_field["key"] == "bank_statements":
+                                next_question += "\n\n📎 Important: You must upload your bank statement files to proceed. Text responses will not be accepted for this step."
                     
-                    logger.info(f"Next question: {next_question}")
-                    return {"reply": next_question}
+                            logger.info(f"Next question: {next_question}")
+                            return {"reply": next_question}
 
         # Handle regular chat (non-pre-approval)
-        if not message_histories[user_email]:
-            message_histories[user_email].append({"role": "system", "content": SYSTEM_PROMPT})
-
-        message_histories[user_email].append({"role": "user", "content": user_message})
+        # Generic first-turn questions can be answered from the cache. Cached
+        # replies are shared between users, so they are generated without history
+        cache_key = None
+        if user_message and not uploaded_files_info and (
+            chat_memory.turn_count(user_email) == 0 or is_context_free(user_message)
+        ):
+            cache_key = answer_cache.make_key(user_message, SYSTEM_PROMPT)
+        chat_memory.append(user_email, "user", user_message)
 
         # Handle file upload acknowledgment in regular chat
         if uploaded_files_info: 
             file_names = [f["original_filename"] for f in uploaded_files_info]
             file_acknowledgment = f"✅ I've received your file(s): {', '.join(file_names)}. "
-            
+        
             # Add context about the files to the conversation
             file_context = f"User uploaded files: {', '.join(file_names)}. "
-            message_histories[user_email].append({"role": "system", "content": file_context})
+            chat_memory.append(user_email, "system", file_context)
 
         # Real-time mortgage rate or government resource handling
-        user_lower = user_message.lower()
-        if any(kw in user_lower for kw in ["mortgage rates", "home loan rates", "current rates", "rates"]):
-            try:
-                rates = await get_mortgage_rates()
-                formatted_rates = "\n".join([f"{k}: {v}" for k, v in rates.items()])
-                print("formatted",formatted_rates)
+        if intent == RATES:
+            formatted_rates = rate_feed.formatted()
+            if formatted_rates:
                 bot_reply = (
-                    f"To day current mortgage rates:\n{formatted_rates}\n\n"
+                    f"Today's mortgage rates:\n{formatted_rates}\n\n"
                     "Please reach out to us to get a personalized quote. "
                     "Let me know if you would like to connect with a Loan Officer."
                 )
-            except Exception:
+            else:
                 bot_reply = "Sorry, I couldn't fetch the latest mortgage rates right now."
-        elif any(kw in user_lower for kw in ["fannie mae", "freddie mac", "hud", "government loan"]):
-            summaries = {
-                "Fannie Mae": get_fannie_mae_summary(),
-                "Freddie Mac": get_freddie_mac_summary(),
-                "HUD FHA": get_hud_fha_summary()
-            }
-            bot_reply = "Here is official information on U.S. housing finance programs:\n\n"
-            for name, summary in summaries.items():
-                bot_reply += f"**{name}**\n{summary}\n\n"
+        elif intent == GOV_RESOURCES:
+            summaries = gov_resources.get()
+            if summaries:
+                bot_reply = "Here is official information on U.S. housing finance programs:\n\n"
+                for name, summary in summaries.items():
+                    bot_reply += f"**{name}**\n{summary}\n\n"
+            else:
+                bot_reply = (
+                    "I'm refreshing the official Fannie Mae, Freddie Mac and HUD program summaries right now. "
+                    "Please ask again in a moment."
+                )
         else:
-            response = client.chat.completions.create(
-                model="gpt-5",
-                messages=message_histories[user_email],
-                max_completion_tokens=500
-            )
-            bot_reply = response.choices[0].message.content.strip()
+            bot_reply = answer_cache.get(cache_key) if cache_key else None
+            if bot_reply is None:
+                response = await client.chat.completions.create(
+                    model="gpt-5",
+                    messages=chat_memory.standalone(user_message) if cache_key else chat_memory.messages(user_email),
+                    max_completion_tokens=500
+                )
+                bot_reply = response.choices[0].message.content.strip()
+                if cache_key:
+                    answer_cache.set(cache_key, bot_reply)
 
         # Add file acknowledgment to regular responses
         if uploaded_files_info and not state["preapproval_started"]:
@@ -467,24 +386,11 @@ async def chat(
             bot_reply =  bot_reply
 
         # Apply text replacements
-        replacements = {
-            "speak with a lender": "please reach out to us",
-            "talk to a lender": "please reach out to us",
-            "consult with a lender": "please reach out to us",
-            "contact a lender": "please reach out to us",
-            "talk to your bank": "please reach out to us",
-            "consult your bank": "please reach out to us",
-            "speak to your bank": "please reach out to us",
-            "consult with your lender": "please reach out to us",
-            "reach out to a lender": "please reach out to us",
-        }
+        bot_reply = reply_rewriter.rewrite(bot_reply)
 
-        for phrase, replacement in replacements.items():
-            bot_reply = bot_reply.replace(phrase, replacement)
-
-        message_histories[user_email].append({"role": "assistant", "content": bot_reply})
+        chat_memory.append(user_email, "assistant", bot_reply)
         if bot_reply.strip():
-            chat_collection.insert_one({
+            await write_behind.write(chat_collection, {
                 "email": user_email,
                 "message": bot_reply,
                 "sender": "bot",
@@ -493,14 +399,103 @@ async def chat(
 
         return {"reply": bot_reply}
 
+    except SessionConflictError:
+        raise HTTPException(status_code=409, detail="Your pre-approval session was updated by another request. Please retry.")
     except asyncio.CancelledError:
         raise HTTPException(status_code=499, detail="Request cancelled by client")
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.post("/chat/stream")
+async def chat_stream(input: ChatInput):
+    """Stream the bot reply token by token as Server-Sent Events"""
+    user_email = input.email
+    user_message = input.message.strip()
+    user_lower = user_message.lower()
+    state = await chat_sessions.peek(user_email)
+
+    # Commands, the pre-approval wizard and the rates/resources lookups are not
+    # generated by the model, so they are answered in full as a single event.
+    needs_full_reply = (
+        not user_message
+        or user_lower in ["restart", "back"]
+        or (state is not None and state["preapproval_started"])
+        or intent_router.route(user_message) is not None
+    )
+    if needs_full_reply:
+        result = await chat(input=input, message=None, email=None, files=None)
+
+        async def full_reply_stream():
+            yield _sse("done", {"reply": result["reply"]})
+
+        return StreamingResponse(full_reply_stream(), media_type="text/event-stream")
+
+    logger.info(f"Streaming chat request from {user_email}: {user_message}")
+    await write_behind.write(chat_collection, input.dict())
+    cache_key = None
+    if chat_memory.turn_count(user_email) == 0 or is_context_free(user_message):
+        cache_key = answer_cache.make_key(user_message, SYSTEM_PROMPT)
+    chat_memory.append(user_email, "user", user_message)
+    cached_reply = answer_cache.get(cache_key) if cache_key else None
+
+    async def token_stream():
+        parts = []
+        rewriter = reply_rewriter.stream()
+        if cached_reply is not None:
+            parts.append(cached_reply)
+            rewritten = rewriter.feed(cached_reply)
+            if rewritten:
+                yield _sse("token", {"token": rewritten})
+        try:
+            if cached_reply is None:
+                stream = await client.chat.completions.create(
+                    model="gpt-5",
+                    messages=chat_memory.standalone(user_message) if cache_key else chat_memory.messages(user_email),
+                    max_completion_tokens=500,
+                    stream=True
+                )
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        parts.append(token)
+                        rewritten = rewriter.feed(token)
+                        if rewritten:
+                            yield _sse("token", {"token": rewritten})
+        except Exception as e:
+            logger.error(f"Streaming error for {user_email}: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        tail = rewriter.flush()
+        if tail:
+            yield _sse("token", {"token": tail})
+
+        raw_reply = "".join(parts).strip()
+        if cache_key and cached_reply is None:
+            answer_cache.set(cache_key, raw_reply)
+        bot_reply = reply_rewriter.rewrite(raw_reply)
+        chat_memory.append(user_email, "assistant", bot_reply)
+        if bot_reply:
+            await write_behind.write(chat_collection, {
+                "email": user_email,
+                "message": bot_reply,
+                "sender": "bot",
+                "timestamp": datetime.utcnow()
+            })
+        yield _sse("done", {"reply": bot_reply})
+
+    return StreamingResponse(
+        token_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/azure-chat")
-async def chat(request: Request):
+async def azure_chat(request: Request):
     try:
         data = await request.json()
         user_message = data.get("message", "")
@@ -13,15 +13,25 @@ def calculate_payoff_date(start_month: int, start_year: int, loan_term_years: in
     except ValueError:
         return "Invalid Date"
     # main.py
-from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 import math
-from typing import Literal
+import json
+import numpy as np
+from typing import List, Literal, Optional
+
+from app.models import ExtraPaymentRule
+from app.services.amortization_engine import AmortizationSchedule, amortize, amortize_cents, level_payment
+from app.services.arm_simulation import ARM_MAX_PATHS, ARM_MAX_SEED, ArmTerms, IndexModel, run_arm_simulation
+from app.services.extra_payments import ExtraPaymentCalendar, month_index
+from app.services.result_cache import result_cache, canonical_hash, etag_for, etag_matches, not_modified
 
 router = APIRouter()
 
+MONTH_ABBREVIATIONS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                       'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 
 
 class MortgageInputs(BaseModel):
@@ -57,6 +67,18 @@ class MortgageInputs(BaseModel):
     extraOneTimePay: float = 0
     extraOneTimePayMonth: int = 1
     extraOneTimePayYear: int = 2025
+    extraPaymentRules: List[ExtraPaymentRule] = []
+
+class YearlyCostItem(BaseModel):
+    year: int  # loan year, 1-based
+    principalAndInterest: float
+    propertyTax: float
+    homeInsurance: float
+    pmi: float
+    hoa: float
+    otherCosts: float
+    total: float
+    cumulativeTotal: float
 
 class MortgageResults(BaseModel):
     monthlyPayment: float
@@ -76,19 +98,13 @@ class MortgageResults(BaseModel):
     payoffDateWithExtras: str = ""
     monthsSaved: int = 0
     interestSaved: float = 0
+    # Down payment plus every payment over the term, costs escalated yearly
+    totalCostOfOwnership: float = 0
+    yearlyCosts: List[YearlyCostItem] = []
 
-def calculate_mortgage_payment(principal: float, annual_rate: float, years: int) -> float:
-    """Calculate monthly mortgage payment using the standard formula"""
-    if annual_rate == 0:
-        return principal / (years * 12)
-    
-    monthly_rate = annual_rate / 100 / 12
-    num_payments = years * 12
-    
-    monthly_payment = principal * (monthly_rate * (1 + monthly_rate) ** num_payments) / \
-                     ((1 + monthly_rate) ** num_payments - 1)
-    
-    return monthly_payment
+def calculate_mortgage_payment(principal, annual_rate, years):
+    """Calculate monthly mortgage payment using the standard formula; arguments may be NumPy arrays"""
+    return level_payment(principal, annual_rate, years)
 
 def calculate_amortization_with_extras(
     principal: float, 
@@ -104,9 +120,15 @@ def calculate_amortization_with_extras(
     extra_yearly_year: int = 2025,
     extra_onetime: float = 0,
     extra_onetime_month: int = 1,
-    extra_onetime_year: int = 2025
+    extra_onetime_year: int = 2025,
+    extra_rules: List[ExtraPaymentRule] = ()
 ) -> tuple:
-    """Calculate mortgage with extra payments"""
+    """
+    Calculate mortgage with extra payments, one month at a time.
+
+    Kept as the reference for the with-extras figures mortgage_results
+    takes from the amortization engine.
+    """
     if annual_rate == 0 or principal <= 0:
         return 0, 0, f"{start_year + years}", 0
     
@@ -119,35 +141,22 @@ def calculate_amortization_with_extras(
     payment_number = 0
     current_date = datetime(start_year, start_month, 1)
     
-    extra_monthly_start = datetime(extra_monthly_start_year, extra_monthly_start_month, 1)
-    extra_yearly_date = datetime(extra_yearly_year, extra_yearly_month, 1)
-    extra_onetime_date = datetime(extra_onetime_year, extra_onetime_month, 1)
+    # Compile every extra payment once into a per-month lookup
+    extra_calendar = ExtraPaymentCalendar(start_month, start_year, years * 12 * 2)
+    extra_calendar.add_recurring(extra_monthly, month_index(extra_monthly_start_month, extra_monthly_start_year))
+    extra_calendar.add_recurring(extra_yearly, month_index(extra_yearly_month, extra_yearly_year), every_months=12)
+    extra_calendar.add_one_time(extra_onetime, month_index(extra_onetime_month, extra_onetime_year))
+    for rule in extra_rules:
+        extra_calendar.add_rule(rule, scheduled_payment=base_payment)
     
     while balance > 0.01 and payment_number < years * 12 * 2:  # Safety limit
-        payment_number += 1
-        
         # Calculate interest for this month
         interest_payment = balance * monthly_rate
         principal_payment = base_payment - interest_payment
         
-        # Calculate extra payments for this month
-        extra_this_month = 0
-        
-        # Extra monthly payment
-        if current_date >= extra_monthly_start and extra_monthly > 0:
-            extra_this_month += extra_monthly
-        
-        # Extra yearly payment (if it's the right month and year)
-        if (current_date.month == extra_yearly_date.month and 
-            current_date.year >= extra_yearly_date.year and 
-            extra_yearly > 0):
-            extra_this_month += extra_yearly
-        
-        # Extra one-time payment
-        if (current_date.month == extra_onetime_date.month and 
-            current_date.year == extra_onetime_date.year and 
-            extra_onetime > 0):
-            extra_this_month += extra_onetime
+        # Extra payments for this month
+        extra_this_month = extra_calendar[payment_number]
+        payment_number += 1
         
         # Total payment (principal + extra, but not more than remaining balance)
         total_principal_payment = min(principal_payment + extra_this_month, balance)
@@ -172,129 +181,464 @@ def calculate_amortization_with_extras(
 
 
 
+def percent_or_dollar(value: float, value_type: str, base, periods: int = 12):
+    """Monthly amount of a percent-of-base or dollar cost"""
+    if value_type == 'percent':
+        return base * value / 100 / 12
+    return value / periods + np.zeros_like(base)
+
+
+def calculate_monthly_costs(inputs: MortgageInputs, home_price=None, down_payment=None, interest_rate=None,
+                            loan_term=None) -> dict:
+    """
+    Down payment, loan amount and every monthly cost of `inputs`.
+
+    `home_price`, `down_payment` (in inputs.downPaymentType units),
+    `interest_rate` and `loan_term` override the matching inputs and may be
+    NumPy arrays; values then come back as arrays broadcast from them.
+    """
+    home_price = np.asarray(inputs.homePrice if home_price is None else home_price, dtype=float)
+    down_payment = np.asarray(inputs.downPayment if down_payment is None else down_payment, dtype=float)
+    interest_rate = inputs.interestRate if interest_rate is None else interest_rate
+    loan_term = inputs.loanTerm if loan_term is None else loan_term
+    if inputs.downPaymentType == 'percent':
+        down_payment_amount = home_price * (down_payment / 100)
+    else:
+        down_payment_amount = down_payment + np.zeros_like(home_price)
+    # A down payment above the price leaves nothing to finance
+    loan_amount = np.maximum(home_price - down_payment_amount, 0.0)
+    monthly_payment = calculate_mortgage_payment(loan_amount, interest_rate, loan_term)
+
+    zero = np.zeros_like(home_price)
+    property_tax_monthly = home_insurance_monthly = pmi_monthly = hoa_monthly = other_costs_monthly = zero
+    if inputs.includeTaxesCosts:
+        property_tax_monthly = percent_or_dollar(inputs.propertyTax, inputs.propertyTaxType, home_price)
+        home_insurance_monthly = percent_or_dollar(inputs.homeInsurance, inputs.homeInsuranceType, home_price)
+        # PMI is charged on the loan; dollar PMI, HOA and other costs are entered per month
+        pmi_monthly = percent_or_dollar(inputs.pmiInsurance, inputs.pmiInsuranceType, loan_amount, periods=1)
+        hoa_monthly = percent_or_dollar(inputs.hoaFee, inputs.hoaFeeType, home_price, periods=1)
+        other_costs_monthly = percent_or_dollar(inputs.otherCosts, inputs.otherCostsType, home_price)
+
+    costs = {
+        "downPaymentAmount": down_payment_amount,
+        "loanAmount": loan_amount,
+        "monthlyPayment": monthly_payment,
+        "propertyTaxMonthly": property_tax_monthly,
+        "homeInsuranceMonthly": home_insurance_monthly,
+        "pmiMonthly": pmi_monthly,
+        "hoaMonthly": hoa_monthly,
+        "otherCostsMonthly": other_costs_monthly,
+    }
+    costs["totalMonthlyPayment"] = (monthly_payment + property_tax_monthly + home_insurance_monthly +
+                                    pmi_monthly + hoa_monthly + other_costs_monthly)
+    return {name: float(value) if np.ndim(value) == 0 else value for name, value in costs.items()}
+
+
+def mortgage_extra_calendar(inputs: MortgageInputs, base_payment: float, count: int) -> ExtraPaymentCalendar:
+    """Every extra payment of `inputs` as one amount per payment month"""
+    extra_calendar = ExtraPaymentCalendar(inputs.startMonth, inputs.startYear, count)
+    extra_calendar.add_recurring(inputs.extraMonthlyPay, month_index(inputs.extraMonthlyPayMonth, inputs.extraMonthlyPayYear))
+    extra_calendar.add_recurring(inputs.extraYearlyPay, month_index(inputs.extraYearlyPayMonth, inputs.extraYearlyPayYear),
+                                 every_months=12)
+    extra_calendar.add_one_time(inputs.extraOneTimePay, month_index(inputs.extraOneTimePayMonth, inputs.extraOneTimePayYear))
+    for rule in inputs.extraPaymentRules:
+        extra_calendar.add_rule(rule, scheduled_payment=base_payment)
+    return extra_calendar
+
+
+def project_yearly_costs(inputs: MortgageInputs, costs: dict, loan_payments: np.ndarray) -> List[dict]:
+    """
+    Year-by-year cost over the loan term. Property tax, insurance, HOA and
+    other costs grow by their *Increase percentage once per loan year; PMI
+    is charged only while the loan is outstanding.
+    `loan_payments` holds the principal and interest paid in each month.
+    """
+    years = inputs.loanTerm
+    monthly = np.zeros(years * 12)
+    monthly[:min(len(loan_payments), len(monthly))] = loan_payments[:len(monthly)]
+    principal_and_interest = monthly.reshape(years, 12).sum(axis=1)
+    months_outstanding = np.clip(len(loan_payments) - 12 * np.arange(years), 0, 12)
+
+    def escalated(monthly_cost: float, increase_percent: float) -> np.ndarray:
+        # Cumulative growth factor of each loan year: 1, (1 + g), (1 + g)^2, ...
+        growth = np.cumprod(np.r_[1.0, np.full(years - 1, 1 + increase_percent / 100)])
+        return monthly_cost * 12 * growth
+
+    breakdown = {
+        "principalAndInterest": principal_and_interest,
+        "propertyTax": escalated(costs["propertyTaxMonthly"], inputs.propertyTaxIncrease),
+        "homeInsurance": escalated(costs["homeInsuranceMonthly"], inputs.homeInsuranceIncrease),
+        "pmi": costs["pmiMonthly"] * months_outstanding,
+        "hoa": escalated(costs["hoaMonthly"], inputs.hoaFeeIncrease),
+        "otherCosts": escalated(costs["otherCostsMonthly"], inputs.otherCostsIncrease),
+    }
+    breakdown["total"] = sum(breakdown.values())
+    breakdown["cumulativeTotal"] = np.cumsum(breakdown["total"])
+    columns = {name: np.round(values, 2).tolist() for name, values in breakdown.items()}
+    return [
+        {"year": year + 1, **{name: values[year] for name, values in columns.items()}}
+        for year in range(years)
+    ]
+
+
+def mortgage_results(inputs: MortgageInputs, exact: bool = False) -> MortgageResults:
+    """Everything /calculate reports for `inputs`"""
+    costs = calculate_monthly_costs(inputs)
+    loan_amount = costs["loanAmount"]
+    
+    # Totals of the loan itself (Principal & Interest)
+    if loan_amount <= 0:
+        total_interest = 0
+        total_payments = 0
+    elif exact:
+        schedule = amortize_cents(loan_amount, inputs.interestRate, inputs.loanTerm, inputs.startMonth, inputs.startYear)
+        costs["totalMonthlyPayment"] += schedule.monthly_payment - costs["monthlyPayment"]
+        costs["monthlyPayment"] = schedule.monthly_payment
+        total_payments = schedule.total_payments
+        total_interest = schedule.total_interest
+    else:
+        total_payments = costs["monthlyPayment"] * inputs.loanTerm * 12
+        total_interest = total_payments - loan_amount
+    
+    # Calculate payoff date (without extra payments)
+    payoff_date = calculate_payoff_date(inputs.startMonth, inputs.startYear, inputs.loanTerm)
+    
+    # Calculate with extra payments if any are specified
+    has_extra_payments = (inputs.extraMonthlyPay > 0 or 
+                         inputs.extraYearlyPay > 0 or 
+                         inputs.extraOneTimePay > 0 or
+                         bool(inputs.extraPaymentRules))
+    
+    months = inputs.loanTerm * 12
+    loan_payments = np.zeros(0)
+    if loan_amount > 0:
+        # The schedule with extras (identical to the plain one without) gives
+        # the principal and interest actually paid each month
+        extra = mortgage_extra_calendar(inputs, costs["monthlyPayment"], months * 2).amounts
+        engine = amortize_cents if exact else amortize
+        schedule = engine(loan_amount, inputs.interestRate, inputs.loanTerm, inputs.startMonth, inputs.startYear,
+                          extra=extra)
+        loan_payments = schedule.total_payment
+    
+    if has_extra_payments and loan_amount > 0:
+        total_interest_with_extras = schedule.total_interest
+        total_payments_with_extras = schedule.total_payments
+        # Month after the last payment, as calculate_amortization_with_extras reports it
+        payoff_index = inputs.startYear * 12 + inputs.startMonth - 1 + len(schedule)
+        payoff_date_with_extras = f"{MONTH_ABBREVIATIONS[payoff_index % 12]}. {payoff_index // 12}"
+        months_saved = months - len(schedule)
+        interest_saved = total_interest - total_interest_with_extras
+    else:
+        total_interest_with_extras = total_interest
+        total_payments_with_extras = total_payments
+        payoff_date_with_extras = payoff_date
+        months_saved = 0
+        interest_saved = 0
+    
+    yearly_costs = project_yearly_costs(inputs, costs, loan_payments)
+    total_cost_of_ownership = costs["downPaymentAmount"] + (yearly_costs[-1]["cumulativeTotal"] if yearly_costs else 0)
+    
+    return MortgageResults(
+        **{name: round(value, 2) for name, value in costs.items()},
+        totalInterest=round(total_interest, 2),
+        totalPayments=round(total_payments, 2),
+        payoffDate=payoff_date,
+        totalInterestWithExtras=round(total_interest_with_extras, 2),
+        totalPaymentsWithExtras=round(total_payments_with_extras, 2),
+        payoffDateWithExtras=payoff_date_with_extras,
+        monthsSaved=months_saved,
+        interestSaved=round(interest_saved, 2),
+        totalCostOfOwnership=round(total_cost_of_ownership, 2),
+        yearlyCosts=yearly_costs
+    )
+
+
 @router.post("/calculate", response_model=MortgageResults)
-async def calculate_mortgage(inputs: MortgageInputs):
+async def calculate_mortgage(
+    inputs: MortgageInputs,
+    engine: Literal["float", "cents"] = Query("float", description="cents computes in integer cents with per-payment rounding"),
+    if_none_match: Optional[str] = Header(None)
+):
+    cache_key = canonical_hash("calculate", inputs, engine=engine)
+    etag = etag_for(cache_key)
+    if etag_matches(if_none_match, etag):
+        result_cache.revalidated()
+        return not_modified(etag)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        # Calculate down payment amount
-        if inputs.downPaymentType == 'percent':
-            down_payment_amount = inputs.homePrice * (inputs.downPayment / 100)
-        else:
-            down_payment_amount = inputs.downPayment
-        
-        # Calculate loan amount
-        loan_amount = inputs.homePrice - down_payment_amount
-        
-        # Calculate monthly mortgage payment (Principal & Interest)
-        if loan_amount <= 0:
-            monthly_payment = 0
-            total_interest = 0
-            total_payments = 0
-        else:
-            monthly_payment = calculate_mortgage_payment(loan_amount, inputs.interestRate, inputs.loanTerm)
-            total_payments = monthly_payment * inputs.loanTerm * 12
-            total_interest = total_payments - loan_amount
-        
-        # Calculate monthly taxes and costs
-        property_tax_monthly = 0
-        home_insurance_monthly = 0
-        pmi_monthly = 0
-        hoa_monthly = 0
-        other_costs_monthly = 0
-        
-        if inputs.includeTaxesCosts:
-            # Property Tax
-            if inputs.propertyTaxType == 'percent':
-                property_tax_monthly = (inputs.homePrice * inputs.propertyTax / 100) / 12
-            else:
-                property_tax_monthly = inputs.propertyTax / 12
-            
-            # Home Insurance
-            if inputs.homeInsuranceType == 'percent':
-                home_insurance_monthly = (inputs.homePrice * inputs.homeInsurance / 100) / 12
-            else:
-                home_insurance_monthly = inputs.homeInsurance / 12
-            
-            # PMI Insurance
-            if inputs.pmiInsuranceType == 'percent':
-                pmi_monthly = (loan_amount * inputs.pmiInsurance / 100) / 12
-            else:
-                pmi_monthly = inputs.pmiInsurance
-            
-            # HOA Fee
-            if inputs.hoaFeeType == 'percent':
-                hoa_monthly = (inputs.homePrice * inputs.hoaFee / 100) / 12
-            else:
-                hoa_monthly = inputs.hoaFee
-            
-            # Other Costs
-            if inputs.otherCostsType == 'percent':
-                other_costs_monthly = (inputs.homePrice * inputs.otherCosts / 100) / 12
-            else:
-                other_costs_monthly = inputs.otherCosts / 12
-        
-        # Calculate total monthly payment
-        total_monthly_payment = (monthly_payment + property_tax_monthly + 
-                               home_insurance_monthly + pmi_monthly + 
-                               hoa_monthly + other_costs_monthly)
-        
-        # Calculate payoff date (without extra payments)
-        payoff_date = calculate_payoff_date(inputs.startMonth, inputs.startYear, inputs.loanTerm)
+        results = mortgage_results(inputs, exact=engine == "cents")
+        return result_cache.set(cache_key, json.dumps(results.model_dump()).encode())
         
-        # Calculate with extra payments if any are specified
-        has_extra_payments = (inputs.extraMonthlyPay > 0 or 
-                             inputs.extraYearlyPay > 0 or 
-                             inputs.extraOneTimePay > 0)
-        
-        if has_extra_payments and loan_amount > 0:
-            (total_interest_with_extras, 
-             total_payments_with_extras, 
-             payoff_date_with_extras, 
-             months_with_extras) = calculate_amortization_with_extras(
-                loan_amount,
-                inputs.interestRate,
-                inputs.loanTerm,
-                inputs.startMonth,
-                inputs.startYear,
-                inputs.extraMonthlyPay,
-                inputs.extraMonthlyPayMonth,
-                inputs.extraMonthlyPayYear,
-                inputs.extraYearlyPay,
-                inputs.extraYearlyPayMonth,
-                inputs.extraYearlyPayYear,
-                inputs.extraOneTimePay,
-                inputs.extraOneTimePayMonth,
-                inputs.extraOneTimePayYear
-            )
-            
-            months_saved = (inputs.loanTerm * 12) - months_with_extras
-            interest_saved = total_interest - total_interest_with_extras
-        else:
-            total_interest_with_extras = total_interest
-            total_payments_with_extras = total_payments + property_tax_monthly * inputs.loanTerm * 12 + home_insurance_monthly * inputs.loanTerm * 12 + (pmi_monthly + hoa_monthly + other_costs_monthly) * inputs.loanTerm * 12
-            payoff_date_with_extras = payoff_date
-            months_saved = 0
-            interest_saved = 0
-        
-        return MortgageResults(
-            monthlyPayment=round(monthly_payment, 2),
-            totalMonthlyPayment=round(total_monthly_payment, 2),
-            totalInterest=round(total_interest, 2),
-            totalPayments=round(total_payments, 2),
-            loanAmount=round(loan_amount, 2),
-            downPaymentAmount=round(down_payment_amount, 2),
-            propertyTaxMonthly=round(property_tax_monthly, 2),
-            homeInsuranceMonthly=round(home_insurance_monthly, 2),
-            pmiMonthly=round(pmi_monthly, 2),
-            hoaMonthly=round(hoa_monthly, 2),
-            otherCostsMonthly=round(other_costs_monthly, 2),
-            payoffDate=payoff_date,
-            totalInterestWithExtras=round(total_interest_with_extras, 2),
-            totalPaymentsWithExtras=round(total_payments_with_extras, 2),
-            payoffDateWithExtras=payoff_date_with_extras,
-            monthsSaved=months_saved,
-            interestSaved=round(interest_saved, 2)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Calculation error: {str(e)}")
+
+
+class AffordabilityInputs(MortgageInputs):
+    homePrice: float = 0
+    monthlyBudget: float
+
+class AffordabilityResults(BaseModel):
+    maxHomePrice: float
+    maxLoanAmount: float
+    method: Literal['closed-form', 'bisection']
+    iterations: int = 0
+    results: MortgageResults
+
+# Candidate prices evaluated per bisection round; the bracket shrinks by this factor each round
+AFFORDABILITY_SECTIONS = 64
+AFFORDABILITY_MAX_PRICE = 1e10
+
+
+def total_monthly_cost(inputs: MortgageInputs, home_price):
+    return calculate_monthly_costs(inputs, home_price)["totalMonthlyPayment"]
+
+
+def solve_affordability(inputs: AffordabilityInputs) -> tuple:
+    """
+    Highest home price whose total monthly cost fits inputs.monthlyBudget.
+    Returns (home_price, method, iterations).
+
+    Once the loan is positive every cost is linear in the price, so two
+    evaluations give the line and the budget is solved for directly. When
+    the answer falls outside that linear piece (a dollar down payment
+    larger than the price, say) the price is bracketed and narrowed by
+    evaluating AFFORDABILITY_SECTIONS prices per round in one array pass.
+    """
+    budget = inputs.monthlyBudget
+    if total_monthly_cost(inputs, 0.0) > budget:
+        raise HTTPException(status_code=400, detail="The budget does not cover the fixed monthly costs")
+
+    # Prices above `floor` have a positive loan
+    floor = inputs.downPayment if inputs.downPaymentType == 'dollar' else 0.0
+    low, high = floor + 1.0, floor + 1_000_001.0
+    low_cost, high_cost = total_monthly_cost(inputs, np.array([low, high]))
+    slope = (high_cost - low_cost) / (high - low)
+    if slope > 0:
+        price = low + (budget - low_cost) / slope
+        if price > floor and abs(total_monthly_cost(inputs, price) - budget) < 0.005:
+            return price, 'closed-form', 0
+
+    low, high = 0.0, max(floor, 1.0)
+    while total_monthly_cost(inputs, high) <= budget:
+        low, high = high, high * 2
+        if high > AFFORDABILITY_MAX_PRICE:
+            raise HTTPException(status_code=400, detail="The monthly cost does not grow with the home price")
+    iterations = 0
+    while high - low > 0.005:
+        candidates = np.linspace(low, high, AFFORDABILITY_SECTIONS + 1)
+        fits = np.flatnonzero(total_monthly_cost(inputs, candidates) <= budget)
+        last_fit = int(fits[-1])
+        low, high = candidates[last_fit], candidates[min(last_fit + 1, AFFORDABILITY_SECTIONS)]
+        iterations += 1
+    return low, 'bisection', iterations
+
+
+@router.post("/affordability", response_model=AffordabilityResults)
+async def affordability(inputs: AffordabilityInputs, if_none_match: Optional[str] = Header(None)):
+    """Maximum home price and loan for a monthly budget, with the /calculate breakdown at that price"""
+    if inputs.monthlyBudget <= 0:
+        raise HTTPException(status_code=400, detail="Monthly budget must be positive")
+    if inputs.loanTerm <= 0 or inputs.interestRate < 0:
+        raise HTTPException(status_code=400, detail="Loan term must be positive and the rate non-negative")
+    cache_key = canonical_hash("affordability", inputs)
+    etag = etag_for(cache_key)
+    if etag_matches(if_none_match, etag):
+        result_cache.revalidated()
+        return not_modified(etag)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        home_price, method, iterations = solve_affordability(inputs)
+        # Round down so the breakdown never exceeds the budget
+        home_price = math.floor(home_price * 100) / 100
+        solved = MortgageInputs(**{**inputs.model_dump(exclude={"monthlyBudget"}), "homePrice": home_price})
+        results = mortgage_results(solved)
+        content = AffordabilityResults(
+            maxHomePrice=home_price,
+            maxLoanAmount=results.loanAmount,
+            method=method,
+            iterations=iterations,
+            results=results
         )
-        
+        return result_cache.set(cache_key, json.dumps(content.model_dump()).encode())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Calculation error: {str(e)}")
+
+
+class SweepInputs(MortgageInputs):
+    # Rates as a list, or from rateFrom to rateTo (inclusive) in rateStep steps
+    rates: List[float] = []
+    rateFrom: Optional[float] = None
+    rateTo: Optional[float] = None
+    rateStep: float = 0.125
+    terms: List[int] = [10, 15, 20, 30]
+    # In downPaymentType units; defaults to downPayment alone
+    downPayments: List[float] = []
+
+class SweepResults(BaseModel):
+    rates: List[float]
+    terms: List[int]
+    downPayments: List[float]
+    loanAmount: List[float]
+    # Indexed [down payment][term][rate]
+    monthlyPayment: List[List[List[float]]]
+    totalMonthlyPayment: List[List[List[float]]]
+    totalInterest: List[List[List[float]]]
+
+SWEEP_MAX_CELLS = 20000
+
+
+def sweep_rates(inputs: SweepInputs) -> np.ndarray:
+    if inputs.rates:
+        return np.asarray(inputs.rates, dtype=float)
+    if inputs.rateFrom is None or inputs.rateTo is None:
+        return np.asarray([inputs.interestRate], dtype=float)
+    if inputs.rateStep <= 0 or inputs.rateTo < inputs.rateFrom:
+        raise HTTPException(status_code=400, detail="rateFrom must not exceed rateTo and rateStep must be positive")
+    count = int(math.floor((inputs.rateTo - inputs.rateFrom) / inputs.rateStep + 1e-9)) + 1
+    return np.round(inputs.rateFrom + inputs.rateStep * np.arange(count), 6)
+
+
+@router.post("/calculate/sweep", response_model=SweepResults)
+async def calculate_sweep(inputs: SweepInputs, if_none_match: Optional[str] = Header(None)):
+    """Payment and interest over a down payment x term x rate grid, computed as one broadcast array expression"""
+    rates = sweep_rates(inputs)
+    terms = np.asarray(inputs.terms or [inputs.loanTerm], dtype=int)
+    down_payments = np.asarray(inputs.downPayments or [inputs.downPayment], dtype=float)
+    if (rates < 0).any() or (terms <= 0).any():
+        raise HTTPException(status_code=400, detail="Rates cannot be negative and terms must be positive")
+    if len(rates) * len(terms) * len(down_payments) > SWEEP_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f"Sweeps are limited to {SWEEP_MAX_CELLS} cells")
+
+    cache_key = canonical_hash("calculate-sweep", inputs)
+    etag = etag_for(cache_key)
+    if etag_matches(if_none_match, etag):
+        result_cache.revalidated()
+        return not_modified(etag)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        costs = calculate_monthly_costs(
+            inputs,
+            down_payment=down_payments[:, None, None],
+            interest_rate=rates[None, None, :],
+            loan_term=terms[None, :, None]
+        )
+        shape = (len(down_payments), len(terms), len(rates))
+        monthly_payment = np.broadcast_to(costs["monthlyPayment"], shape)
+        loan_amount = np.broadcast_to(costs["loanAmount"], shape)
+        total_interest = monthly_payment * terms[None, :, None] * 12 - loan_amount
+        content = {
+            "rates": rates.tolist(),
+            "terms": terms.tolist(),
+            "downPayments": down_payments.tolist(),
+            "loanAmount": np.round(loan_amount[:, 0, 0], 2).tolist(),
+            "monthlyPayment": np.round(monthly_payment, 2).tolist(),
+            "totalMonthlyPayment": np.round(np.broadcast_to(costs["totalMonthlyPayment"], shape), 2).tolist(),
+            "totalInterest": np.round(total_interest, 2).tolist(),
+        }
+        return result_cache.set(cache_key, json.dumps(content).encode())
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Calculation error: {str(e)}")
 
+
+class ArmInputs(BaseModel):
+    loanAmount: float
+    loanTerm: int = 30
+    initialRate: float
+    # e.g. a 5/1 ARM: 60 fixed months, then adjusts every 12
+    fixedPeriodMonths: int = 60
+    adjustmentMonths: int = 12
+    initialCap: float = 2
+    periodicCap: float = 1
+    lifetimeCap: float = 5
+    margin: float = 2.75
+    # Lowest rate after adjustment; defaults to the margin
+    floor: Optional[float] = None
+    roundingStep: float = 0.125
+    # Index rate model (Vasicek): current level, long-run mean, mean reversion per year, volatility in points per sqrt(year)
+    indexRate: float
+    indexMean: Optional[float] = None
+    indexMeanReversion: float = 0.25
+    indexVolatility: float = 1.0
+    paths: int = 10000
+    seed: Optional[int] = None
+    percentiles: List[float] = [5, 25, 50, 75, 95]
+
+class ArmSimulationResults(BaseModel):
+    paths: int
+    # Pass back as `seed` to reproduce this run
+    seed: int
+    percentiles: List[float]
+    initialPayment: float
+    years: List[int]
+    # Indexed [percentile][loan year], taken at the end of each loan year
+    payment: List[List[float]]
+    rate: List[List[float]]
+    cumulativeInterest: List[List[float]]
+    # Indexed [percentile]
+    totalInterest: List[float]
+    maxPayment: List[float]
+
+
+@router.post("/calculate/arm", response_model=ArmSimulationResults)
+async def simulate_arm(inputs: ArmInputs):
+    """Monte Carlo percentiles of ARM payments, rates and interest over simulated index-rate paths"""
+    if inputs.loanAmount <= 0 or inputs.loanTerm <= 0 or inputs.initialRate < 0:
+        raise HTTPException(status_code=400, detail="Loan amount and term must be positive and the rate non-negative")
+    if inputs.fixedPeriodMonths < 1 or inputs.adjustmentMonths < 1 or inputs.roundingStep <= 0:
+        raise HTTPException(status_code=400, detail="Fixed period, adjustment interval and rounding step must be positive")
+    if min(inputs.initialCap, inputs.periodicCap, inputs.lifetimeCap, inputs.indexMeanReversion, inputs.indexVolatility) < 0:
+        raise HTTPException(status_code=400, detail="Caps, mean reversion and volatility cannot be negative")
+    if not 1 <= inputs.paths <= ARM_MAX_PATHS:
+        raise HTTPException(status_code=400, detail=f"paths must be between 1 and {ARM_MAX_PATHS}")
+    if inputs.seed is not None and not 0 <= inputs.seed <= ARM_MAX_SEED:
+        raise HTTPException(status_code=400, detail=f"seed must be between 0 and {ARM_MAX_SEED}")
+    if not inputs.percentiles or any(not 0 <= q <= 100 for q in inputs.percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+
+    terms = ArmTerms(
+        loan_amount=inputs.loanAmount,
+        term_months=inputs.loanTerm * 12,
+        initial_rate=inputs.initialRate,
+        fixed_months=inputs.fixedPeriodMonths,
+        adjustment_months=inputs.adjustmentMonths,
+        initial_cap=inputs.initialCap,
+        periodic_cap=inputs.periodicCap,
+        lifetime_cap=inputs.lifetimeCap,
+        margin=inputs.margin,
+        floor=inputs.margin if inputs.floor is None else inputs.floor,
+        rounding_step=inputs.roundingStep
+    )
+    index = IndexModel(
+        initial=inputs.indexRate,
+        mean=inputs.indexRate if inputs.indexMean is None else inputs.indexMean,
+        speed=inputs.indexMeanReversion,
+        volatility=inputs.indexVolatility
+    )
+    try:
+        seed, summary = await run_arm_simulation(terms, index, inputs.paths, inputs.percentiles, inputs.seed)
+        content = {
+            "paths": inputs.paths,
+            "seed": seed,
+            "percentiles": inputs.percentiles,
+            "initialPayment": round(float(calculate_mortgage_payment(inputs.loanAmount, inputs.initialRate, inputs.loanTerm)), 2),
+            "years": list(range(1, inputs.loanTerm + 1)),
+            "payment": np.round(summary["payment"], 2).tolist(),
+            "rate": np.round(summary["rate"], 3).tolist(),
+            "cumulativeInterest": np.round(summary["cumulative_interest"], 2).tolist(),
+            "totalInterest": np.round(summary["total_interest"], 2).tolist(),
+            "maxPayment": np.round(summary["max_payment"], 2).tolist(),
+        }
+        return Response(content=json.dumps(content).encode(), media_type="application/json")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Calculation error: {str(e)}")
@@ -1,12 +1,13 @@
 import asyncio
+import json
 from collections import defaultdict
 from fastapi import APIRouter, HTTPException, logger, Form, UploadFile, File
 from fastapi.logger import logger
-from openai import AzureOpenAI, BaseModel, OpenAI
+from openai import AsyncOpenAI, AzureOpenAI, BaseModel
 import os
 from dotenv import load_dotenv
 from typing import Optional,  List
-from app.constants import PREAPPROVAL_FIELDS, SYSTEM_PROMPT, EMAIL_BODY
+from app.constants import SYSTEM_PROMPT, EMAIL_BODY, USER_CHAT_SYSTEM_PROMPT
 from app.database import chat_collection, pre_approvals_collection
 from datetime import datetime
 import uuid
@@ -14,24 +15,25 @@ from pathlib import Path
 import aiofiles 
 from app.email_service import send_client_notification_with_attachments, send_email_with_attachment, send_email_with_multiple_attachments
 from app.pdf_generator import write_preapproval_to_sheet 
+from app.services.write_behind import write_behind
+from app.services.rate_feed import rate_feed
+from app.services.conversation_memory import user_chat_memory
+from app.services.answer_cache import answer_cache, is_context_free
+from app.services.intent_router import intent_router, PREAPPROVAL
+from app.services.session_store import user_chat_sessions, new_preapproval_state, SessionConflictError
+from app.services.preapproval_flow import preapproval_flow
 load_dotenv() 
-message_histories = defaultdict(list)
 
 
 router = APIRouter(prefix="/user-chat", tags=["Chat"])
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 CLIENT_EMAIL = os.getenv("CLIENT_EMAIL")
-#state management
-user_states = defaultdict(lambda: {
-    "preapproval_started": False,
-    "current_question_index": -1,
-    "answers": {},
-    "uploaded_files": []
-})
 ALLOWED_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
 
 class ChatInput(BaseModel):
     email: str
@@ -59,8 +61,7 @@ async def save_uploaded_file(file: UploadFile, user_email: str) -> dict:
         
         # Generate unique filename
         unique_filename = f"{uuid.uuid4()}_{file.filename}"
-        # file_path = UPLOAD_DIR / unique_filename
-        file_path = unique_filename
+        file_path = UPLOAD_DIR / unique_filename
         # Save file
         async with aiofiles.open(file_path, 'wb') as f:
             await f.write(content)
@@ -77,7 +78,7 @@ async def save_uploaded_file(file: UploadFile, user_email: str) -> dict:
         }
         
         # Insert file info into database
-        chat_collection.insert_one({
+        await write_behind.write(chat_collection, {
             "email": user_email,
             "file_info": file_info,
             "sender": "user",
@@ -92,6 +93,32 @@ async def save_uploaded_file(file: UploadFile, user_email: str) -> dict:
         logger.error(f"Error saving file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
 
+async def submit_pre_approval(email: str, state: dict) -> None:
+    """Store a completed application and notify the customer and the client"""
+    await write_behind.write(pre_approvals_collection, {
+        "email": email,
+        "data": state["answers"],
+        "uploaded_files": state["uploaded_files"],
+        "submitted_at": datetime.utcnow()
+    }, durable=True)
+    # Generate PDF
+    # pdf_path = generate_preapproval_pdf(state["answers"], user_email)
+    #spread sheet
+    spreadsheet_url = write_preapproval_to_sheet(state["answers"])
+    # Send PDF via email
+    send_email_with_attachment(
+        to_email=email,
+        subject="Your Pre-Approval Application",
+        body=EMAIL_BODY,
+        # file_path=pdf_path,
+    )
+    send_client_notification_with_attachments(
+        client_email= CLIENT_EMAIL, 
+        customer_email=email,
+        preapproval_data=state["answers"],
+        uploaded_files=state["uploaded_files"],
+    )
+
 @router.get("/")
 async def root():
     return {"message": "chat routes API"}
@@ -100,28 +127,19 @@ async def root():
 @router.get("/mortgage-rates")
 async def get_live_mortgage_rates():
     """
-    Returns live daily mortgage rates using GPT-5 (no scraping needed).
+    Returns today's mortgage rates from the background rate feed (no network I/O per request).
     """
-    try:
-        # Ask GPT-5 directly for live rates
-        response = client.chat.completions.create(
-            model="gpt-5",
-            messages=[
-                {"role": "system", "content": "You are a mortgage rate assistant that provides accurate, up-to-date rates."},
-                {"role": "user", "content": "Give me today's average US mortgage rates for 30-year fixed, 15-year fixed, and 5/1 ARM in percentage format."}
-            ],
-            max_completion_tokens=300
-        )
-
-        bot_reply = response.choices[0].message.content.strip()
-
-        return {
-            "reply": bot_reply
-        }
-
-    except Exception as e:
-        logger.error(f"Error fetching live mortgage rates: {e}")
-        raise HTTPException(status_code=500, detail="Unable to fetch live mortgage rates at this moment.")
+    formatted_rates = rate_feed.formatted()
+    if not formatted_rates:
+        raise HTTPException(status_code=503, detail="Mortgage rates are being refreshed. Please try again shortly.")
+
+    snapshot = rate_feed.snapshot()
+    return {
+        "reply": formatted_rates,
+        "rates": snapshot["value"],
+        "as_of": snapshot["fetched_at"],
+        "source": snapshot["source"]
+    }
 @router.post("/pre-approval")
 async def pre_approval_form(
     email: Optional[str] = Form(None),
@@ -134,161 +152,128 @@ async def pre_approval_form(
         if not email:
             raise HTTPException(status_code=400, detail="Email is required.")
 
-        if email not in user_states:
-            user_states[email] = {
-                "preapproval_started": False,
-                "current_question_index": 0,
-                "answers": {},
-                "uploaded_files": []
-            }
-
-        state = user_states[email]
-        uploaded_files_info = []
-
-        # Handle uploaded files
-        if files:
-            for file in files:
-                if file.filename:
-                    file_info = await save_uploaded_file(file, email)
-                    uploaded_files_info.append(file_info)
-                    state["uploaded_files"].append(file_info)
-
-        # Restart command
-        if message and message.lower() == "restart":
-            user_states[email] = {
-                "preapproval_started": True,
-                "current_question_index": 0,
-                "answers": {},
-                "uploaded_files": []
-            }
-            return {"reply": "Pre-approval restarted.\n\n" + PREAPPROVAL_FIELDS[0]["question"]}
-
-        # Back command
-        if message and message.lower() == "back" and state["preapproval_started"]:
-            state["current_question_index"] = max(state["current_question_index"] - 1, 0)
-            return {"reply": f"Okay, let's go back.\n{PREAPPROVAL_FIELDS[state['current_question_index']]['question']}"}
-
-        # Start process
-        if message and any(k in message.lower() for k in ["preapproval", "pre-approval", "pre approval", "pre app", "pre-app", "preapp"]) and not state["preapproval_started"]:
-            state["preapproval_started"] = True
-            state["current_question_index"] = 0
-            state["answers"]["email"] = email
-
-            if PREAPPROVAL_FIELDS[0]["key"] == "email":
-                return {"reply": f"Great! Let's begin your pre-approval process.\n\n• Your email is: {email}\n• Do you want to keep this email? (yes/no)"}
-            else:
-                return {"reply": f"Great! Let's begin your pre-approval process.\n\n{PREAPPROVAL_FIELDS[0]['question']}"}
-
-        # Handle Q&A
-        if state["preapproval_started"]:
-            idx = state["current_question_index"]
-            if idx >= len(PREAPPROVAL_FIELDS):
-                return {"reply": "Pre-approval process already completed!"}
-
-            field = PREAPPROVAL_FIELDS[idx]
-            key = field["key"]
-
-            # Special case: email
-            if key == "email":
-                # If email is not set in answers yet, show the confirmation
-                if not state["answers"].get("email"):
-                    state["answers"]["email"] = email
-                    return {"reply": f"• Your email is: {email}\n• Do you want to keep this email? (yes/no)"}
+        async with user_chat_sessions.session(email) as session:
+            state = session.state
+            uploaded_files_info = []
+
+            # Handle uploaded files
+            if files:
+                for file in files:
+                    if file.filename:
+                        file_info = await save_uploaded_file(file, email)
+                        uploaded_files_info.append(file_info)
+                        state["uploaded_files"].append(file_info)
+
+            # Restart command
+            if message and message.lower() == "restart":
+                session.reset(new_preapproval_state(started=True))
+                return {"reply": "Pre-approval restarted.\n\n" + preapproval_flow.question(0)}
+
+            # Back command
+            if message and message.lower() == "back" and state["preapproval_started"]:
+                state["current_question_index"] = max(state["current_question_index"] - 1, 0)
+                return {"reply": f"Okay, let's go back.\n{preapproval_flow.question(state['current_question_index'])}"}
+
+            # Start process
+            if message and intent_router.route(message) == PREAPPROVAL and not state["preapproval_started"]:
+                state["preapproval_started"] = True
+                state["current_question_index"] = 0
+                state["answers"]["email"] = email
+
+                if preapproval_flow.keys[0] == "email":
+                    return {"reply": f"Great! Let's begin your pre-approval process.\n\n• Your email is: {email}\n• Do you want to keep this email? (yes/no)"}
+                else:
+                    return {"reply": f"Great! Let's begin your pre-approval process.\n\n{preapproval_flow.question(0)}"}
+
+            # Handle Q&A
+            if state["preapproval_started"]:
+                idx = state["current_question_index"]
+                if idx >= len(preapproval_flow):
+                    return {"reply": "Pre-approval process already completed!"}
+
+                field = preapproval_flow.field(idx)
+                key = field["key"]
+
+                # Special case: email
+                if key == "email":
+                    # If email is not set in answers yet, show the confirmation
+                    if not state["answers"].get("email"):
+                        state["answers"]["email"] = email
+                        return {"reply": f"• Your email is: {email}\n• Do you want to keep this email? (yes/no)"}
                 
-                # Handle user response to email confirmation
-                if message.lower() in ["yes", "y"]:
-                    # Keep the pre-filled email
-                    message_histories[email].append({
-                        "role": "user",
-                        "content": f"[Pre-Approval Answer] email: {email}"
-                    })
-                    state["current_question_index"] += 1
+                    # Handle user response to email confirmation
+                    if message.lower() in ["yes", "y"]:
+                        # Keep the pre-filled email
+                        user_chat_memory.append(email, "user", f"[Pre-Approval Answer] email: {email}")
+                        state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
                     
-                    if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                        next_q = PREAPPROVAL_FIELDS[state["current_question_index"]]["question"]
-                        return {"reply": f"✅ Email kept as {email}.\n\n{next_q}"}
-                    else:
-                        # This shouldn't happen if email is first question, but handle it
-                        return {"reply": f"✅ Email kept as {email}."}
+                        if state["current_question_index"] < len(preapproval_flow):
+                            next_q = preapproval_flow.question(state["current_question_index"])
+                            return {"reply": f"✅ Email kept as {email}.\n\n{next_q}"}
+                        else:
+                            # This shouldn't happen if email is first question, but handle it
+                            return {"reply": f"✅ Email kept as {email}."}
                         
-                elif message.lower() in ["no", "n"]:
-                    return {"reply": "Please enter your preferred email:"}
+                    elif message.lower() in ["no", "n"]:
+                        return {"reply": "Please enter your preferred email:"}
                     
-                elif "@" in message:
-                    # User provided a different email
-                    state["answers"]["email"] = message
-                    message_histories[email].append({
-                        "role": "user",
-                        "content": f"[Pre-Approval Answer] email: {message}"
-                    })
-                    state["current_question_index"] += 1
+                    elif "@" in message:
+                        # User provided a different email
+                        state["answers"]["email"] = message
+                        user_chat_memory.append(email, "user", f"[Pre-Approval Answer] email: {message}")
+                        state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
                     
-                    if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                        next_q = PREAPPROVAL_FIELDS[state["current_question_index"]]["question"]
-                        return {"reply": f"✅ Email updated to {message}.\n\n{next_q}"}
+                        if state["current_question_index"] < len(preapproval_flow):
+                            next_q = preapproval_flow.question(state["current_question_index"])
+                            return {"reply": f"✅ Email updated to {message}.\n\n{next_q}"}
+                        else:
+                            return {"reply": f"✅ Email updated to {message}."}
                     else:
-                        return {"reply": f"✅ Email updated to {message}."}
-                else:
-                    # Invalid response, ask again
-                    return {"reply": f"• Your email is: {email}\n• Do you want to keep this email? (yes/no)"}
-            # Special case: bank statements
-            elif key == "bank_statements":
-                if not uploaded_files_info and not (message and message.strip()):
-                    return {"reply": "❌ Please upload your bank statements to continue."}
-
-                if uploaded_files_info:
-                    file_names = [f["original_filename"] for f in uploaded_files_info]
-                    state["answers"][key] = f"Files uploaded: {', '.join(file_names)}"
-                    state["current_question_index"] += 1
-
-                    if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                        next_question = PREAPPROVAL_FIELDS[state["current_question_index"]]["question"]
-                        return {"reply": f"✅ Received bank statements: {', '.join(file_names)}\n\n{PREAPPROVAL_FIELDS[state['current_question_index']]['question']}"}
+                        # Invalid response, ask again
+                        return {"reply": f"• Your email is: {email}\n• Do you want to keep this email? (yes/no)"}
+                # Special case: bank statements
+                elif key == "bank_statements":
+                    if not uploaded_files_info and not (message and message.strip()):
+                        return {"reply": "❌ Please upload your bank statements to continue."}
+
+                    if uploaded_files_info:
+                        file_names = [f["original_filename"] for f in uploaded_files_info]
+                        state["answers"][key] = f"Files uploaded: {', '.join(file_names)}"
+                        state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
+
+                        if state["current_question_index"] < len(preapproval_flow):
+                            next_question = preapproval_flow.question(state["current_question_index"])
+                            return {"reply": f"✅ Received bank statements: {', '.join(file_names)}\n\n{preapproval_flow.question(state['current_question_index'])}"}
+                        else:
+                            await submit_pre_approval(email, state)
+                            session.delete()
+                            return {"reply": f"✅ Thanks! We've received your complete pre-approval application."}
                     else:
-                        pre_approvals_collection.insert_one({
-                            "email": email,
-                            "data": state["answers"],
-                            "uploaded_files": state["uploaded_files"],
-                            "submitted_at": datetime.utcnow()
-                        })
-                        # Generate PDF
-                        # pdf_path = generate_preapproval_pdf(state["answers"], user_email)
-                        #spread sheet
-                        spreadsheet_url = write_preapproval_to_sheet(state["answers"])
-                        # Send PDF via email
-                        send_email_with_attachment(
-                            to_email=email,
-                            subject="Your Pre-Approval Application",
-                            body=EMAIL_BODY,
-                            # file_path=pdf_path,
-                        )
-                        send_client_notification_with_attachments(
-                            client_email= CLIENT_EMAIL, 
-                            customer_email=email,
-                            preapproval_data=state["answers"],
-                            uploaded_files=state["uploaded_files"],
-                        )
-                        del user_states[email]
-                        return {"reply": f"✅ Thanks! We've received your complete pre-approval application."}
+                        return {"reply": "❌ Error: Bank statements are required to complete your pre-approval."}
+
+                # All other fields
                 else:
-                    return {"reply": "❌ Error: Bank statements are required to complete your pre-approval."}
+                    if not preapproval_flow.validate(key, message):
+                        return {"reply": f"Invalid input. Please try again.\n\n{field['question']}"}
 
-            # All other fields
-            else:
-                if "validate" in field and not field["validate"](message):
-                    return {"reply": f"Invalid input. Please try again.\n\n{field['question']}"}
+                    state["answers"][key] = message
+                    state["current_question_index"] = preapproval_flow.next_index(state["answers"], idx + 1)
 
-                state["answers"][key] = message
-                state["current_question_index"] += 1
+                    if state["current_question_index"] < len(preapproval_flow):
+                        next_field = preapproval_flow.field(state["current_question_index"])
+                        next_question = next_field["question"]
 
-                if state["current_question_index"] < len(PREAPPROVAL_FIELDS):
-                    next_field = PREAPPROVAL_FIELDS[state["current_question_index"]]
-                    next_question = next_field["question"]
+                        if next_field["key"] == "bank_statements":
+                            next_question += "\n\n📎 Please upload your bank statements."
+                        return {"reply": next_question}
 
-                    if next_field["key"] == "bank_statements":
-                        next_question += "\n\n📎 Please upload your bank statements."
-                    return {"reply": next_question}
+                    # Remaining answers (e.g. bank statements) came in through the form
+                    await submit_pre_approval(email, state)
+                    session.delete()
+                    return {"reply": f"✅ Thanks! We've received your complete pre-approval application."}
 
+    except SessionConflictError:
+        raise HTTPException(status_code=409, detail="Your pre-approval session was updated by another request. Please retry.")
     except asyncio.CancelledError:
         raise HTTPException(status_code=499, detail="Request cancelled by client")
     except Exception as e:
@@ -296,6 +281,71 @@ async def pre_approval_form(
         raise HTTPException(status_code=500, detail=str(e))
     
 
+
+@router.post("/pre-approval/form")
+async def pre_approval_form_submit(
+    email: str = Form(...),
+    answers: Optional[str] = Form(None),
+    files: Optional[List[UploadFile]] = File(None)
+):
+    """
+    Submit any subset of pre-approval answers in one request.
+
+    `answers` is a JSON object of field key -> answer. All answers are
+    validated together; valid ones are stored, and the response lists
+    per-field errors and the questions still unanswered. Files are taken
+    as the bank statements. The chat wizard resumes from the same session.
+    """
+    try:
+        try:
+            submitted = json.loads(answers) if answers else {}
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="answers must be a JSON object.")
+        if not isinstance(submitted, dict):
+            raise HTTPException(status_code=400, detail="answers must be a JSON object.")
+
+        async with user_chat_sessions.session(email) as session:
+            state = session.state
+            state["preapproval_started"] = True
+            state["answers"].setdefault("email", email)
+
+            accepted, errors = preapproval_flow.apply_answers(state["answers"], submitted)
+
+            uploaded_files_info = []
+            if files:
+                for file in files:
+                    if file.filename:
+                        file_info = await save_uploaded_file(file, email)
+                        uploaded_files_info.append(file_info)
+                        state["uploaded_files"].append(file_info)
+            if uploaded_files_info:
+                file_names = [f["original_filename"] for f in uploaded_files_info]
+                state["answers"]["bank_statements"] = f"Files uploaded: {', '.join(file_names)}"
+                accepted.append("bank_statements")
+
+            state["current_question_index"] = preapproval_flow.next_index(state["answers"])
+
+            complete = preapproval_flow.is_complete(state["answers"])
+            if complete:
+                await submit_pre_approval(email, state)
+                session.delete()
+
+            return {
+                "accepted": accepted,
+                "errors": errors,
+                "next_questions": preapproval_flow.next_questions(state["answers"]),
+                "complete": complete
+            }
+
+    except HTTPException:
+        raise
+    except SessionConflictError:
+        raise HTTPException(status_code=409, detail="Your pre-approval session was updated by another request. Please retry.")
+    except Exception as e:
+        logger.error(f"Unexpected error in pre-approval form: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+
 @router.post("/chatbot")
 async def chatbot(
     input: Optional[ChatInput] = None,
@@ -304,37 +354,19 @@ async def chatbot(
     files: Optional[List[UploadFile]] = File(None)
 ):
     try:
-        print("DEBUG email:", email)
-        print("DEBUG message:", message)
-        print("DEBUG files:", files)
-        # Initialize user history if not present
-        if email not in message_histories or not message_histories[email]:
-            message_histories[email] = [
-                {"role": "system", "content":  """
-You are a knowledgeable and friendly assistant specializing in U.S. home loans and mortgages. 
-You provide clear, accurate, and up-to-date information about:
-- Home loan types (fixed-rate, adjustable-rate, FHA, VA, USDA, jumbo, etc.)
-- Mortgage interest rates and factors affecting them
-- Loan eligibility, credit scores, and down payment requirements
-- The home buying process, including pre-approval, application, underwriting, and closing
-- Refinancing options and strategies
-- Federal and state-specific programs for first-time buyers
-
-Guidelines:
-1. Only answer questions related to U.S. home loans, mortgages, or closely related financial topics.
-2. If the question is outside your scope, politely say:
-   "I specialize in U.S. home loans. Could you ask something related to that?"
-3. Use plain, easy-to-understand language.
-4. Provide examples, numbers, and explanations when helpful.
-5. Keep tone professional but approachable, like a trusted loan advisor.
-"""}
-            ]
-        print("DEBUG history before GPT call:", message_histories.get(email))
         # Store user message
         user_message = message.strip() if message else ""
+        has_files = bool(files) and any(file.filename for file in files)
+        # Generic first-turn questions can be answered from the cache. Cached
+        # replies are shared between users, so they are generated without history
+        cache_key = None
+        if user_message and not has_files and (
+            user_chat_memory.turn_count(email) == 0 or is_context_free(user_message)
+        ):
+            cache_key = answer_cache.make_key(user_message, USER_CHAT_SYSTEM_PROMPT)
         if user_message:
-            message_histories[email].append({"role": "user", "content": user_message})
-            chat_collection.insert_one({
+            user_chat_memory.append(email, "user", user_message)
+            await write_behind.write(chat_collection, {
                 "email": email,
                 "message": user_message,
                 "sender": "user",
@@ -350,21 +382,24 @@ Guidelines:
                     uploaded_files_info.append(file_info)
                     # Add file context for the model
                     file_context = f"User uploaded file: {file_info['original_filename']}"
-                    message_histories[email].append({"role": "system", "content": file_context})
+                    user_chat_memory.append(email, "system", file_context)
 
         # Send to GPT-5
-        response = client.chat.completions.create(
-            model="gpt-5",
-            messages=message_histories[email],
-            max_completion_tokens=1500
-        )
-        print("DEBUG GPT raw response:", response)
-        print("DEBUG 12345678 reply content:", response.choices[0].message.content)
-        bot_reply = response.choices[0].message.content.strip()
+        bot_reply = answer_cache.get(cache_key) if cache_key else None
+        if bot_reply is None:
+            response = await client.chat.completions.create(
+                model="gpt-5",
+                messages=user_chat_memory.standalone(user_message) if cache_key else user_chat_memory.messages(email),
+                max_completion_tokens=1500
+            )
+            logger.debug(f"Model reply for {email}: {response.choices[0].message.content}")
+            bot_reply = response.choices[0].message.content.strip()
+            if cache_key:
+                answer_cache.set(cache_key, bot_reply)
 
         # Store bot reply
-        message_histories[email].append({"role": "assistant", "content": bot_reply})
-        chat_collection.insert_one({
+        user_chat_memory.append(email, "assistant", bot_reply)
+        await write_behind.write(chat_collection, {
             "email": email,
             "message": bot_reply,
             "sender": "bot",
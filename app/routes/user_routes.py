@@ -2,8 +2,7 @@ from fastapi import APIRouter, HTTPException
 from typing import List
 from app.models import User, Chat
 from app.database import user_collection, chat_collection
-from collections import defaultdict
-message_histories = defaultdict(list)
+from app.services.conversation_memory import chat_memory, user_chat_memory
 
 router = APIRouter(prefix="/user")
 
@@ -28,7 +27,8 @@ async def get_user_chat_history(email: str):
     return chats
 @router.delete("/clear-history/{email}")
 async def clear_history(email: str):
-    if email in message_histories:
-        del message_histories[email]
+    cleared_chat = chat_memory.clear(email)
+    cleared_user_chat = user_chat_memory.clear(email)
+    if cleared_chat or cleared_user_chat:
         return {"message": f"History cleared for {email}"}
     return {"message": "No history found for this email"}
\ No newline at end of file
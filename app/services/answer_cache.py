@@ -0,0 +1,100 @@
+import os
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+# Words that tie a question to earlier turns or to the user's own situation
+_CONTEXT_WORDS = re.compile(
+    r"\b(it|its|that|this|these|those|they|them|above|previous|earlier|again|"
+    r"i|me|my|mine|we|our|us)\b"
+)
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = _PUNCTUATION.sub(" ", message.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def is_context_free(message: str) -> bool:
+    """True for generic questions whose answer does not depend on the conversation"""
+    normalized = normalize_message(message)
+    return bool(normalized) and not _CONTEXT_WORDS.search(normalized) and not any(c.isdigit() for c in normalized)
+
+
+@lru_cache(maxsize=16)
+def _prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """LRU cache of model replies keyed on the normalized question and system prompt"""
+
+    def __init__(self, ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def make_key(self, message: str, system_prompt: str) -> str:
+        normalized = normalize_message(message)
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{_prompt_hash(system_prompt)}:{digest}"
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        reply, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return reply
+
+    def set(self, key: str, reply: str) -> None:
+        if not reply:
+            return
+        self._entries[key] = (reply, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,180 @@
+import os
+import logging
+import secrets
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.amortization_engine import level_payment
+from app.services.compute_pool import compute_pool
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ARM_MAX_PATHS = int(os.getenv("ARM_MAX_PATHS", "200000"))
+# Simulations with at least this many paths are split across the compute pool
+ARM_POOL_THRESHOLD = int(os.getenv("ARM_POOL_THRESHOLD", "50000"))
+# Paths per chunk. Each chunk draws from its own child seed, so results for
+# a given seed do not depend on how many workers run the chunks
+ARM_CHUNK_PATHS = 10000
+# Seeds are returned to clients, and JavaScript numbers hold integers exactly only up to 2**53 - 1
+ARM_MAX_SEED = 2 ** 53 - 1
+
+
+class ArmTerms:
+    """Loan terms of an adjustable-rate mortgage; rates in annual percent"""
+
+    def __init__(self, loan_amount: float, term_months: int, initial_rate: float, fixed_months: int,
+                 adjustment_months: int, initial_cap: float, periodic_cap: float, lifetime_cap: float,
+                 margin: float, floor: float, rounding_step: float = 0.125):
+        self.loan_amount = loan_amount
+        self.term_months = term_months
+        self.initial_rate = initial_rate
+        self.fixed_months = fixed_months
+        self.adjustment_months = adjustment_months
+        self.initial_cap = initial_cap
+        self.periodic_cap = periodic_cap
+        self.lifetime_cap = lifetime_cap
+        self.margin = margin
+        self.floor = floor
+        self.rounding_step = rounding_step
+
+
+class IndexModel:
+    """
+    Vasicek (mean-reverting Gaussian) model of the index rate:
+    dr = speed * (mean - r) dt + volatility * dW, with t in years.
+    """
+
+    def __init__(self, initial: float, mean: float, speed: float, volatility: float):
+        self.initial = initial
+        self.mean = mean
+        self.speed = speed
+        self.volatility = volatility
+
+    def step(self, rates: np.ndarray, years: float, rng: np.random.Generator) -> np.ndarray:
+        """Index rates `years` later, drawn from the exact transition distribution"""
+        if self.speed > 0:
+            decay = np.exp(-self.speed * years)
+            spread = self.volatility * np.sqrt((1 - decay ** 2) / (2 * self.speed))
+        else:
+            decay, spread = 1.0, self.volatility * np.sqrt(years)
+        return self.mean + (rates - self.mean) * decay + spread * rng.standard_normal(len(rates))
+
+
+def reset_months(terms: ArmTerms) -> List[int]:
+    """Months (0-based) at which the rate adjusts"""
+    return list(range(terms.fixed_months, terms.term_months, terms.adjustment_months))
+
+
+def simulate_chunk(terms: ArmTerms, index: IndexModel, paths: int, seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    """
+    Simulate `paths` loans. Between resets the rate and payment are
+    constant, so balances over a period follow the annuity closed form and
+    are evaluated only at year ends and at the next reset;
+    at each reset the index is stepped to the reset date, the fully
+    indexed rate (index + margin, rounded to rounding_step) is capped,
+    and the payment re-amortizes the balance over the remaining term.
+    Returns (loan year x path) arrays, taken at the end of each loan year.
+    """
+    rng = np.random.default_rng(seed)
+    years = terms.term_months // 12
+    payment_by_year = np.zeros((years, paths))
+    rate_by_year = np.zeros((years, paths))
+    interest_by_year = np.zeros((years, paths))
+
+    balance = np.full(paths, float(terms.loan_amount))
+    rate = np.full(paths, float(terms.initial_rate))
+    payment = np.full(paths, float(level_payment(terms.loan_amount, terms.initial_rate, terms.term_months / 12)))
+    index_rate = np.full(paths, float(index.initial))
+    cumulative_interest = np.zeros(paths)
+    ceiling = terms.initial_rate + terms.lifetime_cap
+    floor = max(terms.floor, 0.0)
+
+    starts = [0] + reset_months(terms)
+    ends = starts[1:] + [terms.term_months]
+    for number, (start, end) in enumerate(zip(starts, ends)):
+        if number > 0:
+            index_rate = index.step(index_rate, (start - starts[number - 1]) / 12, rng)
+            indexed = np.round((index_rate + terms.margin) / terms.rounding_step) * terms.rounding_step
+            cap = terms.initial_cap if number == 1 else terms.periodic_cap
+            rate = np.clip(np.clip(indexed, rate - cap, rate + cap), floor, ceiling)
+            payment = level_payment(balance, rate, (terms.term_months - start) / 12)
+
+        # Balances only at the months that are needed: year ends inside the
+        # period and the period's last month. Interest paid through month k
+        # of the period is the payments made less the principal repaid.
+        months = np.arange(start, end)
+        year_ends = months[(months + 1) % 12 == 0]
+        needed = np.union1d(year_ends, [end - 1])
+        elapsed = needed - start + 1
+        monthly_rate = rate[:, None] / 100 / 12
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth = (1 + monthly_rate) ** elapsed
+            ending = np.where(
+                monthly_rate == 0,
+                balance[:, None] - payment[:, None] * elapsed,
+                growth * balance[:, None] - payment[:, None] * (growth - 1) / monthly_rate
+            )
+        ending = np.maximum(ending, 0.0)
+        interest = cumulative_interest[:, None] + payment[:, None] * elapsed - (balance[:, None] - ending)
+
+        for month in year_ends.tolist():
+            column = int(np.searchsorted(needed, month))
+            year = month // 12
+            payment_by_year[year] = payment
+            rate_by_year[year] = rate
+            interest_by_year[year] = interest[:, column]
+
+        cumulative_interest = interest[:, -1]
+        balance = ending[:, -1]
+
+    return {
+        "payment": payment_by_year,
+        "rate": rate_by_year,
+        "cumulative_interest": interest_by_year,
+    }
+
+
+def summarize(chunks: Sequence[Dict[str, np.ndarray]], percentiles: Sequence[float]) -> Dict[str, np.ndarray]:
+    """Percentiles across all paths, one row per percentile and one column per loan year"""
+    combined = {name: np.concatenate([chunk[name] for chunk in chunks], axis=1) for name in chunks[0]}
+    summary = {
+        name: np.percentile(values, percentiles, axis=1)
+        for name, values in combined.items()
+    }
+    summary["total_interest"] = np.percentile(combined["cumulative_interest"][-1], percentiles)
+    summary["max_payment"] = np.percentile(combined["payment"].max(axis=0), percentiles)
+    return summary
+
+
+def chunk_seeds(paths: int, seed: Optional[int]) -> tuple:
+    """(seed, [(paths, SeedSequence), ...]); without a seed a fresh one is drawn, so every run can be reproduced"""
+    if seed is None:
+        seed = secrets.randbits(ARM_MAX_SEED.bit_length())
+    root = np.random.SeedSequence(seed)
+    sizes = [min(ARM_CHUNK_PATHS, paths - start) for start in range(0, paths, ARM_CHUNK_PATHS)]
+    return seed, list(zip(sizes, root.spawn(len(sizes))))
+
+
+def simulate_chunks(tasks: Sequence[tuple]) -> List[Dict[str, np.ndarray]]:
+    return [simulate_chunk(*task) for task in tasks]
+
+
+async def run_arm_simulation(terms: ArmTerms, index: IndexModel, paths: int, percentiles: Sequence[float],
+                             seed: Optional[int] = None) -> tuple:
+    """
+    Simulate and summarize, split across the compute pool for large runs and
+    off the event loop for small ones; returns (seed, summary)
+    """
+    seed, chunks = chunk_seeds(paths, seed)
+    tasks = [(terms, index, size, child) for size, child in chunks]
+    if paths < ARM_POOL_THRESHOLD:
+        results = await run_in_threadpool(simulate_chunks, tasks)
+    else:
+        logger.info(f"Simulating {paths} ARM paths in {len(tasks)} pool tasks")
+        results = await compute_pool.map(simulate_chunk, tasks)
+    return seed, summarize(results, percentiles)
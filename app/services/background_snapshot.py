@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundSnapshot:
+    """
+    A value fetched from the network off the request path.
+
+    Requests read the in-memory copy with `get()` and never wait on I/O.
+    The value is refreshed by a periodic task and, when a read finds it older
+    than `refresh_seconds`, by a one-off background refresh
+    (stale-while-revalidate). Every good value is copied to Mongo so a cold
+    worker can serve the last-known-good value before its first fetch.
+    Subclasses implement `fetch()`.
+    """
+
+    def __init__(self, name: str, collection, refresh_seconds: float, source: str = ""):
+        self.name = name
+        self.collection = collection
+        self.refresh_seconds = refresh_seconds
+        self.source = source
+        self.value: Optional[Any] = None
+        self.fetched_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    async def fetch(self) -> Any:
+        raise NotImplementedError
+
+    def is_valid(self, value: Any) -> bool:
+        return bool(value)
+
+    @property
+    def stale(self) -> bool:
+        return self.fetched_at is None or datetime.utcnow() - self.fetched_at > timedelta(seconds=self.refresh_seconds)
+
+    def get(self) -> Optional[Any]:
+        """Current value (possibly stale); schedules a refresh if it is stale"""
+        if self.stale:
+            self.refresh_in_background()
+        return self.value
+
+    def snapshot(self) -> dict:
+        return {
+            "value": self.value,
+            "fetched_at": self.fetched_at.isoformat() + "Z" if self.fetched_at else None,
+            "source": self.source,
+            "stale": self.stale,
+        }
+
+    def refresh_in_background(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        try:
+            self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+        except RuntimeError:
+            # No running loop (called from sync code); the periodic task will catch up
+            pass
+
+    async def refresh(self) -> None:
+        try:
+            value = await self.fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Refreshing {self.name} failed, keeping last-known-good value: {e}")
+            return
+        if not self.is_valid(value):
+            self.last_error = "fetch returned no usable data"
+            logger.warning(f"Refreshing {self.name} returned no usable data, keeping last-known-good value")
+            return
+        self.value = value
+        self.fetched_at = datetime.utcnow()
+        self.last_error = None
+        try:
+            await asyncio.to_thread(
+                self.collection.update_one,
+                {"_id": self.name},
+                {"$set": {"value": value, "fetched_at": self.fetched_at, "source": self.source}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Persisting {self.name} snapshot failed: {e}")
+
+    async def load(self) -> None:
+        """Seed the in-memory copy from Mongo"""
+        try:
+            doc = await asyncio.to_thread(self.collection.find_one, {"_id": self.name})
+        except Exception as e:
+            logger.error(f"Loading {self.name} snapshot failed: {e}")
+            return
+        if doc and self.is_valid(doc.get("value")):
+            self.value = doc["value"]
+            self.fetched_at = doc.get("fetched_at")
+
+    async def start(self) -> None:
+        await self.load()
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        for task in (self._loop_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._loop_task = None
+        self._refresh_task = None
+
+    async def _run(self) -> None:
+        while True:
+            if self.stale:
+                self.refresh_in_background()
+                await self._refresh_task
+            await asyncio.sleep(min(self.refresh_seconds, 300))
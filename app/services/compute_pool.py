@@ -0,0 +1,53 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+COMPUTE_POOL_WORKERS = int(os.getenv("COMPUTE_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+
+class ComputePool:
+    """
+    Process pool for CPU-heavy calculations that would otherwise block the
+    event loop. Started on first use and shut down with the app.
+
+    Functions and arguments must be picklable (module-level functions,
+    NumPy arrays, plain data).
+    """
+
+    def __init__(self, workers: int = COMPUTE_POOL_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.tasks = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info(f"Compute pool started with {self.workers} workers")
+        return self._executor
+
+    async def run(self, fn: Callable, *args) -> Any:
+        self.tasks += 1
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+
+    async def map(self, fn: Callable, chunks: Iterable[tuple]) -> List[Any]:
+        """Run fn(*chunk) for every chunk in parallel; results keep chunk order"""
+        return await asyncio.gather(*(self.run(fn, *chunk) for chunk in chunks))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "started": self._executor is not None, "tasks": self.tasks}
+
+
+compute_pool = ComputePool()
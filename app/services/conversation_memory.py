@@ -0,0 +1,185 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from app.constants import SYSTEM_PROMPT, USER_CHAT_SYSTEM_PROMPT
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "3000"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_SUMMARY_TOKENS", "400"))
+MAX_CONVERSATIONS = int(os.getenv("CHAT_MEMORY_MAX_CONVERSATIONS", "5000"))
+IDLE_TTL_SECONDS = int(os.getenv("CHAT_MEMORY_IDLE_TTL_SECONDS", "3600"))
+
+# Per-message framing overhead the chat API adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_SNIPPET_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for budget accounting"""
+    return len(text) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+class _Conversation:
+    __slots__ = ("turns", "summary", "tokens", "size_bytes", "last_used")
+
+    def __init__(self):
+        self.turns: List[dict] = []
+        self.summary = ""
+        self.tokens = 0
+        self.size_bytes = 0
+        self.last_used = time.monotonic()
+
+
+class ConversationMemory:
+    """
+    Per-user chat histories with a token budget and idle eviction.
+
+    The system prompt is pinned at the head of every history and never counts
+    against the budget. When a conversation goes over budget its oldest turns
+    are folded into a running summary that is sent as a second system message.
+    Idle conversations expire after `idle_ttl_seconds` and the least recently
+    used ones are evicted once `max_conversations` is reached.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        token_budget: int = TOKEN_BUDGET,
+        summary_token_budget: int = SUMMARY_TOKEN_BUDGET,
+        max_conversations: int = MAX_CONVERSATIONS,
+        idle_ttl_seconds: int = IDLE_TTL_SECONDS,
+    ):
+        self.system_prompt = system_prompt
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_conversations = max_conversations
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self.resident_bytes = 0
+        self.evictions = 0
+        self.folded_turns = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._conversations
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def messages(self, key: str) -> List[dict]:
+        """Return the messages to send to the model for this conversation"""
+        history = [{"role": "system", "content": self.system_prompt}]
+        conversation = self._touch(key, create=False)
+        if conversation is None:
+            return history
+        if conversation.summary:
+            history.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{conversation.summary}"
+            })
+        history.extend(conversation.turns)
+        return history
+
+    def standalone(self, message: str) -> List[dict]:
+        """Messages for answering `message` on its own, without any conversation history"""
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": message},
+        ]
+
+    def turn_count(self, key: str) -> int:
+        """Number of turns currently held for this conversation"""
+        conversation = self._conversations.get(key)
+        return len(conversation.turns) if conversation else 0
+
+    def append(self, key: str, role: str, content: str) -> None:
+        """Add a turn and trim the conversation back under its token budget"""
+        conversation = self._touch(key, create=True)
+        message = {"role": role, "content": content}
+        conversation.turns.append(message)
+        conversation.tokens += estimate_tokens(content)
+        self._resize(conversation, len(content.encode("utf-8")))
+        self._enforce_budget(conversation)
+
+    def clear(self, key: str) -> bool:
+        """Forget a conversation; returns False if nothing was stored"""
+        conversation = self._conversations.pop(key, None)
+        if conversation is None:
+            return False
+        self.resident_bytes -= conversation.size_bytes
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        self._evict_idle(time.monotonic())
+        return {
+            "conversations": len(self._conversations),
+            "resident_bytes": self.resident_bytes,
+            "evictions": self.evictions,
+            "folded_turns": self.folded_turns,
+            "token_budget": self.token_budget,
+        }
+
+    def _touch(self, key: str, create: bool) -> Optional[_Conversation]:
+        now = time.monotonic()
+        self._evict_idle(now)
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            if not create:
+                return None
+            conversation = _Conversation()
+            self._conversations[key] = conversation
+            while len(self._conversations) > self.max_conversations:
+                _, evicted = self._conversations.popitem(last=False)
+                self.resident_bytes -= evicted.size_bytes
+                self.evictions += 1
+        else:
+            self._conversations.move_to_end(key)
+        conversation.last_used = now
+        return conversation
+
+    def _evict_idle(self, now: float) -> None:
+        # Entries are kept in last-used order, so idle ones sit at the front
+        while self._conversations:
+            key, oldest = next(iter(self._conversations.items()))
+            if now - oldest.last_used < self.idle_ttl_seconds:
+                break
+            del self._conversations[key]
+            self.resident_bytes -= oldest.size_bytes
+            self.evictions += 1
+
+    def _resize(self, conversation: _Conversation, delta: int) -> None:
+        conversation.size_bytes += delta
+        self.resident_bytes += delta
+
+    def _enforce_budget(self, conversation: _Conversation) -> None:
+        summary_tokens = estimate_tokens(conversation.summary) if conversation.summary else 0
+        # Always keep the latest turn, even if it alone exceeds the budget
+        while conversation.tokens + summary_tokens > self.token_budget and len(conversation.turns) > 1:
+            dropped = conversation.turns.pop(0)
+            conversation.tokens -= estimate_tokens(dropped["content"])
+            self._resize(conversation, -len(dropped["content"].encode("utf-8")))
+            self._fold_into_summary(conversation, dropped)
+            summary_tokens = estimate_tokens(conversation.summary)
+            self.folded_turns += 1
+
+    def _fold_into_summary(self, conversation: _Conversation, message: dict) -> None:
+        snippet = " ".join(message["content"].split())[:SUMMARY_SNIPPET_CHARS]
+        summary = f"{conversation.summary}\n- {message['role']}: {snippet}".strip()
+        # Keep the most recent part of the summary within its own budget
+        max_chars = self.summary_token_budget * 4
+        if len(summary) > max_chars:
+            summary = summary[-max_chars:]
+            summary = summary[summary.find("\n- ") + 1:] if "\n- " in summary else summary
+        self._resize(conversation, len(summary.encode("utf-8")) - len(conversation.summary.encode("utf-8")))
+        conversation.summary = summary
+
+
+chat_memory = ConversationMemory(SYSTEM_PROMPT)
+user_chat_memory = ConversationMemory(USER_CHAT_SYSTEM_PROMPT)
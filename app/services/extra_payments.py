@@ -0,0 +1,110 @@
+from typing import Optional, Union
+
+import numpy as np
+
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+
+def month_number(month: Union[str, int]) -> int:
+    """Month name ("Jan") or number (1-12) -> 1-12"""
+    if isinstance(month, int):
+        return month if 1 <= month <= 12 else 1
+    return MONTHS.get(month, 1)
+
+
+def month_index(month: Union[str, int], year: int) -> int:
+    """Absolute month index (year * 12 + month - 1)"""
+    return year * 12 + month_number(month) - 1
+
+
+class ExtraPaymentCalendar:
+    """
+    Extra payments compiled into one amount per payment month.
+
+    Built once per request for the months a schedule can span, so a
+    schedule looks up month k with `calendar[k]` instead of re-evaluating
+    every rule and one-time payment each month.
+    """
+
+    def __init__(self, start_month: Union[str, int], start_year: int, count: int):
+        self.start_index = month_index(start_month, start_year)
+        self.amounts = np.zeros(count)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def __getitem__(self, payment: int) -> float:
+        """Extra amount for the payment `payment` months after the start (0-based)"""
+        return float(self.amounts[payment]) if 0 <= payment < len(self.amounts) else 0.0
+
+    def add_recurring(self, amount: float, from_index: int, every_months: int = 1,
+                      until_index: Optional[int] = None, annual_increase_percent: float = 0) -> None:
+        """
+        `amount` every `every_months` months from `from_index` through
+        `until_index`, growing by `annual_increase_percent` each full year
+        after the first payment.
+        """
+        if amount <= 0 or every_months < 1:
+            return
+        first = from_index - self.start_index
+        if first < 0:
+            # Keep the rule's phase: first occurrence on or after the schedule start
+            first += -(first // every_months) * every_months
+        last = len(self.amounts) - 1
+        if until_index is not None:
+            last = min(last, until_index - self.start_index)
+        if first > last:
+            return
+        payments = np.arange(first, last + 1, every_months)
+        if annual_increase_percent:
+            years_elapsed = (payments + self.start_index - from_index) // 12
+            self.amounts[payments] += amount * (1 + annual_increase_percent / 100) ** years_elapsed
+        else:
+            self.amounts[payments] += amount
+
+    def add_one_time(self, amount: float, at_index: int) -> None:
+        payment = at_index - self.start_index
+        if amount > 0 and 0 <= payment < len(self.amounts):
+            self.amounts[payment] += amount
+
+    def add_rule(self, rule, scheduled_payment: float = 0) -> None:
+        """Add an ExtraPaymentRule-shaped object"""
+        # Paying half the payment every two weeks makes 26 half payments,
+        # i.e. one extra full payment a year, spread over the months
+        amount = scheduled_payment / 12 if rule.biweekly else rule.amount
+        until_index = month_index(rule.untilMonth or 12, rule.untilYear) if rule.untilYear else None
+        self.add_recurring(
+            amount,
+            month_index(rule.fromMonth, rule.fromYear),
+            every_months=rule.everyMonths,
+            until_index=until_index,
+            annual_increase_percent=rule.annualIncreasePercent
+        )
+
+
+def compile_extra_payments(extra_payments, start_month: Union[str, int], start_year: int, count: int,
+                           scheduled_payment: float = 0) -> ExtraPaymentCalendar:
+    """Calendar for an ExtraPayments-shaped object (monthly, yearly, oneTime and rules entries)"""
+    calendar = ExtraPaymentCalendar(start_month, start_year, count)
+    if not extra_payments:
+        return calendar
+
+    monthly = getattr(extra_payments, "monthly", None)
+    if monthly and monthly.amount > 0:
+        calendar.add_recurring(monthly.amount, month_index(monthly.fromMonth, monthly.fromYear))
+
+    # Yearly payments fall in the given month of every year from fromYear on
+    yearly = getattr(extra_payments, "yearly", None)
+    if yearly and yearly.amount > 0:
+        calendar.add_recurring(yearly.amount, month_index(yearly.fromMonth, yearly.fromYear), every_months=12)
+
+    for one_time in getattr(extra_payments, "oneTime", None) or []:
+        calendar.add_one_time(one_time.amount, month_index(one_time.month, one_time.year))
+
+    for rule in getattr(extra_payments, "rules", None) or []:
+        calendar.add_rule(rule, scheduled_payment)
+
+    return calendar
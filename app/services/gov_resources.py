@@ -0,0 +1,75 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import httpx
+from lxml import html
+from dotenv import load_dotenv
+
+from app.database import snapshots_collection
+from app.services.background_snapshot import BackgroundSnapshot
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GOV_RESOURCES_REFRESH_SECONDS = int(os.getenv("GOV_RESOURCES_REFRESH_SECONDS", str(6 * 3600)))
+
+GOV_RESOURCE_SOURCES = {
+    "Fannie Mae": "https://selling-guide.fanniemae.com/",
+    "Freddie Mac": "https://guide.freddiemac.com/app/guide/browse",
+    "HUD FHA": "https://www.hud.gov/hud-partners/single-family-fha-resource-center",
+}
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+MIN_PARAGRAPH_LENGTH = 80
+PARAGRAPHS_PER_SOURCE = 2
+
+
+def extract_summary(content: bytes) -> str:
+    """First substantial paragraphs of a page"""
+    doc = html.fromstring(content)
+    text_blocks = []
+    for paragraph in doc.iter("p"):
+        text = " ".join(paragraph.text_content().split())
+        if len(text) > MIN_PARAGRAPH_LENGTH:
+            text_blocks.append(text)
+            if len(text_blocks) == PARAGRAPHS_PER_SOURCE:
+                break
+    return "\n\n".join(text_blocks) if text_blocks else "No content extracted."
+
+
+class GovResourcesSnapshot(BackgroundSnapshot):
+    """Fannie Mae, Freddie Mac and HUD summaries, fetched concurrently in the background"""
+
+    def __init__(self, sources: Dict[str, str] = GOV_RESOURCE_SOURCES,
+                 refresh_seconds: float = GOV_RESOURCES_REFRESH_SECONDS):
+        super().__init__("gov_resources", snapshots_collection, refresh_seconds, source=", ".join(sources.values()))
+        self.sources = sources
+
+    async def _fetch_one(self, client: httpx.AsyncClient, name: str, url: str) -> Optional[str]:
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            # Parsing is CPU-bound; keep it off the event loop
+            return await asyncio.to_thread(extract_summary, response.content)
+        except Exception as e:
+            logger.warning(f"Fetching {name} summary failed: {e}")
+            return None
+
+    async def fetch(self) -> Dict[str, str]:
+        async with httpx.AsyncClient(headers=HEADERS, timeout=10, follow_redirects=True) as client:
+            results = await asyncio.gather(
+                *(self._fetch_one(client, name, url) for name, url in self.sources.items())
+            )
+        if not any(results):
+            return {}
+        previous = self.value or {}
+        # A source that failed this round keeps its last good summary
+        return {
+            name: summary if summary is not None else previous.get(name, "Temporarily unavailable.")
+            for name, summary in zip(self.sources, results)
+        }
+
+
+gov_resources = GovResourcesSnapshot()
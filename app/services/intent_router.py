@@ -0,0 +1,123 @@
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+PREAPPROVAL = "preapproval"
+RATES = "rates"
+GOV_RESOURCES = "gov_resources"
+
+# Highest priority first. Phrases match on word boundaries; a trailing "*"
+# makes the phrase a prefix match ("pre app*" also matches "pre application").
+INTENT_TRIGGERS: List[Tuple[str, List[str]]] = [
+    (PREAPPROVAL, ["preapproval", "pre-approval", "pre approval", "pre app*", "pre-app*", "preapp*"]),
+    (RATES, ["mortgage rates", "home loan rates", "current rates", "rates"]),
+    (GOV_RESOURCES, ["fannie mae", "freddie mac", "hud", "government loan"]),
+]
+
+
+def _trie_to_regex(node: dict) -> str:
+    """Emit a character trie as a regex with shared prefixes factored out"""
+    end = node.get("")
+    branches = [re.escape(char) + _trie_to_regex(child) for char, child in sorted(node.items()) if char]
+    if end is not None:
+        if end == "" and branches:
+            # Prefix phrase: the longer continuations are optional
+            return "(?:" + "|".join(branches) + "|)"
+        branches.append(end)
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+class IntentRouter:
+    """
+    Routes a chat message to an intent with a single compiled regex.
+
+    All trigger phrases are folded into one case-insensitive pattern built
+    from a character trie, so each position of the message is tested against
+    shared prefixes rather than against every phrase in turn. When several
+    intents match, the one registered first wins.
+    """
+
+    def __init__(self, triggers: Sequence[Tuple[str, Sequence[str]]] = INTENT_TRIGGERS):
+        self._priority: Dict[str, int] = {}
+        self._intent_by_phrase: Dict[str, str] = {}
+        trie: dict = {}
+        for rank, (intent, phrases) in enumerate(triggers):
+            self._priority[intent] = rank
+            for phrase in phrases:
+                text = phrase.rstrip("*").lower()
+                self._intent_by_phrase.setdefault(text, intent)
+                node = trie
+                for char in text:
+                    node = node.setdefault(char, {})
+                node[""] = "" if phrase.endswith("*") else r"(?!\w)"
+        first_chars = re.escape("".join(sorted(trie)))
+        self._pattern = re.compile(r"(?<!\w)(?=[" + first_chars + "])" + _trie_to_regex(trie), re.IGNORECASE)
+        self._top_intent = triggers[0][0] if triggers else None
+
+    def intents(self, message: str) -> List[str]:
+        """All matching intents, highest priority first"""
+        found = {self._intent_by_phrase[m.group(0).lower()] for m in self._pattern.finditer(message)}
+        return sorted(found, key=self._priority.__getitem__)
+
+    def route(self, message: str) -> Optional[str]:
+        """Highest priority intent in the message, or None"""
+        best = None
+        for match in self._pattern.finditer(message):
+            intent = self._intent_by_phrase[match.group(0).lower()]
+            if intent == self._top_intent:
+                return intent
+            if best is None or self._priority[intent] < self._priority[best]:
+                best = intent
+        return best
+
+
+intent_router = IntentRouter()
+
+
+def _keyword_scan(message: str, triggers: Sequence[Tuple[str, Sequence[str]]] = INTENT_TRIGGERS) -> Optional[str]:
+    """The substring scans the chat routes used before the router existed"""
+    lower = message.lower()
+    for intent, phrases in triggers:
+        if any(phrase.rstrip("*") in lower for phrase in phrases):
+            return intent
+    return None
+
+
+def benchmark(rounds: int = 20000, extra_intents: int = 50) -> Dict[str, float]:
+    """
+    Microseconds per message for the router versus the old keyword scans,
+    with the real trigger table and with `extra_intents` synthetic intents
+    of six phrases each added to it.
+    """
+    messages = [
+        "What is PMI and when can I remove it?",
+        "Can you tell me today's mortgage rates for a 30 year fixed?",
+        "I would like to start my pre-approval",
+        "How does an FHA loan compare to a conventional loan when the buyer separates escrow?",
+        "Tell me about Fannie Mae guidelines for condos",
+    ]
+    synthetic = [
+        (f"intent_{i}", [f"{word} topic {i}" for word in ("escrow", "closing", "appraisal", "title", "survey", "lien")])
+        for i in range(extra_intents)
+    ]
+    results = {}
+    for label, triggers in [("", INTENT_TRIGGERS), (f"_{extra_intents}_extra_intents", INTENT_TRIGGERS + synthetic)]:
+        router = IntentRouter(triggers)
+        candidates = [
+            ("keyword_scan", lambda message: _keyword_scan(message, triggers)),
+            ("intent_router", router.route),
+        ]
+        for name, func in candidates:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for message in messages:
+                    func(message)
+            elapsed = time.perf_counter() - start
+            results[name + label] = round(elapsed / (rounds * len(messages)) * 1e6, 3)
+    return results
+
+
+if __name__ == "__main__":
+    print(benchmark())
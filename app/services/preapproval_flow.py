@@ -0,0 +1,97 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.constants import PREAPPROVAL_FIELDS
+
+logger = logging.getLogger(__name__)
+
+
+class PreApprovalFlow:
+    """
+    PREAPPROVAL_FIELDS compiled once into lookups shared by the chat wizard
+    and the multi-field form endpoint.
+
+    A field counts as answered once its key is present in the answers dict,
+    so optional fields such as the co-borrower name can be answered with "".
+    """
+
+    def __init__(self, fields: Sequence[dict] = PREAPPROVAL_FIELDS):
+        self.fields = list(fields)
+        self.keys = [field["key"] for field in self.fields]
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self._validators: Dict[str, Optional[Callable[[str], bool]]] = {
+            field["key"]: field.get("validate") for field in self.fields
+        }
+        self.file_keys = {field["key"] for field in self.fields if field.get("type") == "file"}
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def field(self, index: int) -> dict:
+        return self.fields[index]
+
+    def question(self, index: int) -> str:
+        return self.fields[index]["question"]
+
+    def index_of(self, key: str) -> int:
+        return self._index[key]
+
+    def validate(self, key: str, value: Any) -> bool:
+        validator = self._validators.get(key)
+        if validator is None:
+            return True
+        if not isinstance(value, str):
+            value = "" if value is None else str(value)
+        try:
+            return bool(validator(value))
+        except (ValueError, TypeError):
+            # e.g. "1.2.3" passes the digit check but not float()
+            return False
+
+    def apply_answers(self, answers: dict, submitted: Dict[str, Any]) -> Tuple[List[str], Dict[str, str]]:
+        """
+        Validate every submitted answer at once and store the valid ones.
+
+        Returns the accepted keys and an error message per rejected key.
+        """
+        accepted = []
+        errors = {}
+        for key, value in submitted.items():
+            if key not in self._index:
+                errors[key] = "Unknown field."
+                continue
+            if key in self.file_keys:
+                errors[key] = "Please upload files for this field."
+                continue
+            value = "" if value is None else str(value).strip()
+            if not self.validate(key, value):
+                errors[key] = f"Invalid input. {self.question(self._index[key])}"
+                continue
+            answers[key] = value
+            accepted.append(key)
+        return accepted, errors
+
+    def next_index(self, answers: dict, start: int = 0) -> int:
+        """First unanswered field at or after `start`, then from the top; len(self) when done"""
+        for i in list(range(start, len(self.keys))) + list(range(0, min(start, len(self.keys)))):
+            if self.keys[i] not in answers:
+                return i
+        return len(self.keys)
+
+    def next_questions(self, answers: dict, limit: Optional[int] = None) -> List[dict]:
+        pending = [
+            {
+                "key": field["key"],
+                "question": field["question"],
+                "type": field.get("type", "text"),
+                **({"allowed_formats": field["allowed_formats"]} if "allowed_formats" in field else {})
+            }
+            for field in self.fields if field["key"] not in answers
+        ]
+        return pending[:limit] if limit else pending
+
+    def is_complete(self, answers: dict) -> bool:
+        return all(key in answers for key in self.keys)
+
+
+preapproval_flow = PreApprovalFlow()
@@ -0,0 +1,67 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import httpx
+from lxml import etree, html
+from dotenv import load_dotenv
+
+from app.database import snapshots_collection
+from app.services.background_snapshot import BackgroundSnapshot
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MORTGAGE_RATES_URL = "https://www.mortgagenewsdaily.com/mortgage-rates"
+MORTGAGE_RATES_SOURCE_NAME = "Mortgage News Daily"
+RATE_FEED_REFRESH_SECONDS = int(os.getenv("RATE_FEED_REFRESH_SECONDS", str(3 * 3600)))
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+_RATES_ROWS = etree.XPath(
+    '//table[contains(concat(" ", normalize-space(@class), " "), " mtg-rates ")]/descendant::tr[position() > 1]'
+)
+
+
+def parse_rates_html(content: bytes) -> Dict[str, str]:
+    """Rate type -> rate value from the mtg-rates tables of a Mortgage News Daily page"""
+    doc = html.fromstring(content)
+    rates = {}
+    for row in _RATES_ROWS(doc):
+        cols = row.findall("td")
+        if len(cols) >= 2:
+            rate_type = " ".join(cols[0].text_content().split())
+            rate_value = " ".join(cols[1].text_content().split())
+            if rate_type and rate_value:
+                rates[rate_type] = rate_value
+    return rates
+
+
+class MortgageRateFeed(BackgroundSnapshot):
+    """Daily mortgage rates, scraped on a schedule and read from memory"""
+
+    def __init__(self, url: str = MORTGAGE_RATES_URL, refresh_seconds: float = RATE_FEED_REFRESH_SECONDS):
+        super().__init__("mortgage_rates", snapshots_collection, refresh_seconds, source=url)
+        self.url = url
+
+    async def fetch(self) -> Dict[str, str]:
+        async with httpx.AsyncClient(headers=HEADERS, timeout=10, follow_redirects=True) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        # Parsing is CPU-bound; keep it off the event loop
+        rates = await asyncio.to_thread(parse_rates_html, response.content)
+        logger.info(f"Fetched {len(rates)} mortgage rates from {self.url}")
+        return rates
+
+    def formatted(self) -> Optional[str]:
+        """Rates as display text with date and source, or None before the first fetch"""
+        rates = self.get()
+        if not rates:
+            return None
+        lines = "\n".join(f"{rate_type}: {rate_value}" for rate_type, rate_value in rates.items())
+        as_of = self.fetched_at.strftime("%b %d, %Y %H:%M UTC")
+        return f"{lines}\n\nSource: {MORTGAGE_RATES_SOURCE_NAME} ({self.url}), as of {as_of}"
+
+
+rate_feed = MortgageRateFeed()
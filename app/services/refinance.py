@@ -0,0 +1,75 @@
+import os
+import logging
+from typing import Dict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.services.amortization_engine import amortize_batch
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REFINANCE_MAX_CANDIDATES = int(os.getenv("REFINANCE_MAX_CANDIDATES", "50"))
+
+
+def payment_streams(loan_amounts: np.ndarray, annual_rates: np.ndarray, term_months: np.ndarray,
+                    horizon: int) -> Dict[str, np.ndarray]:
+    """
+    Month-by-month payments of level-payment loans, one row per loan, zero
+    after payoff. The final payment is the remainder, so each row sums to
+    the loan's total payments.
+    """
+    batch = amortize_batch(loan_amounts, annual_rates, term_months / 12, np.zeros((len(loan_amounts), horizon)))
+    count = batch["payment_count"]
+    rows = np.arange(len(loan_amounts))
+    payments = np.where(np.arange(horizon) < count[:, None], batch["monthly_payment"][:, None], 0.0)
+    payments[rows, count - 1] = batch["total_payments"] - batch["monthly_payment"] * (count - 1)
+    return {"payments": payments, **batch}
+
+
+def evaluate_refinance(balance: float, annual_rate: float, remaining_months: int, new_rates: np.ndarray,
+                       new_term_months: np.ndarray, points: np.ndarray, closing_costs: np.ndarray,
+                       roll_in_costs: np.ndarray, discount_rate: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    Compare keeping the current loan with each candidate refinance, all
+    candidates in one batch.
+
+    Points are a percentage of the new loan. Costs rolled into the loan
+    are financed (the new loan grows so that it still covers the points);
+    otherwise they are paid in cash at closing. Savings in month m are the
+    current payment minus the new one; cumulative savings start at minus
+    the cash paid at closing, and break-even is the first month they turn
+    non-negative (0 when never). NPV discounts the monthly savings at
+    `discount_rate` (annual percent, compounded monthly).
+    """
+    financed = np.where(roll_in_costs, (balance + closing_costs) / (1 - points / 100), balance)
+    upfront = np.where(roll_in_costs, 0.0, closing_costs + financed * points / 100)
+
+    # Row 0 is the current loan, rows 1.. the candidates
+    loan_amounts = np.r_[balance, financed]
+    term_months = np.r_[remaining_months, new_term_months].astype(float)
+    horizon = int(term_months.max())
+    streams = payment_streams(loan_amounts, np.r_[annual_rate, new_rates], term_months, horizon)
+    payments = streams["payments"]
+
+    savings = payments[0] - payments[1:]
+    cumulative = np.cumsum(savings, axis=1) - upfront[:, None]
+    reached = cumulative >= 0
+    break_even = np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, 0)
+    discount = (1 + discount_rate / 100 / 12) ** -np.arange(1, horizon + 1)
+
+    return {
+        "current_payment": streams["monthly_payment"][0],
+        "current_interest": streams["total_interest"][0],
+        "new_loan_amount": financed,
+        "monthly_payment": streams["monthly_payment"][1:],
+        "monthly_savings": savings[:, 0],
+        "upfront_cost": upfront,
+        "break_even_month": break_even,
+        "interest_delta": streams["total_interest"][1:] - streams["total_interest"][0],
+        "lifetime_savings": cumulative[:, -1],
+        "npv": savings @ discount - upfront,
+        "cumulative_savings": cumulative,
+    }
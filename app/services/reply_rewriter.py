@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import time
+import logging
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.constants import REPLY_REPLACEMENTS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REPLY_REPLACEMENTS_FILE = os.getenv("REPLY_REPLACEMENTS_FILE")
+
+
+def load_replacement_rules(path: Optional[str] = REPLY_REPLACEMENTS_FILE) -> Dict[str, str]:
+    """Rules from the JSON file named by REPLY_REPLACEMENTS_FILE, else the defaults"""
+    if not path:
+        return dict(REPLY_REPLACEMENTS)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+        return {str(phrase): str(replacement) for phrase, replacement in rules.items()}
+    except Exception as e:
+        logger.error(f"Could not load reply replacements from {path}, using defaults: {e}")
+        return dict(REPLY_REPLACEMENTS)
+
+
+def _trie_regex(phrases: Iterable[str]) -> str:
+    """Regex for a set of lowercase phrases with shared prefixes factored out"""
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        branches = [(r"\s" if char == " " else re.escape(char)) + emit(child)
+                    for char, child in sorted(node.items()) if char]
+        if "" in node:
+            if not branches:
+                return ""
+            # A shorter phrase ends here, so longer continuations are optional
+            return "(?:" + "|".join(branches) + ")?"
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return emit(trie)
+
+
+class ReplyRewriter:
+    """
+    Applies every phrase replacement in one case-insensitive pass.
+
+    Spaces in a phrase match any single whitespace character, so a phrase
+    broken across a line still matches. A match that starts with a capital
+    letter gets a capitalised replacement. Matching runs on the lowercased
+    reply with a case-sensitive pattern, which is much cheaper than an
+    IGNORECASE alternation.
+    """
+
+    def __init__(self, rules: Dict[str, str]):
+        self.rules = {" ".join(phrase.lower().split()): replacement for phrase, replacement in rules.items() if phrase.strip()}
+        self.max_phrase_length = max((len(phrase) for phrase in self.rules), default=0)
+        regex = _trie_regex(self.rules)
+        self._pattern = re.compile(regex) if self.rules else None
+        # Used when lowercasing changes the text length (rare non-ASCII input)
+        self._pattern_ci = re.compile(regex, re.IGNORECASE) if self.rules else None
+
+    def _matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            matches = self._pattern.finditer(lowered)
+        else:
+            matches = self._pattern_ci.finditer(text)
+        for match in matches:
+            yield match.start(), match.end(), " ".join(match.group(0).lower().split())
+
+    def _replacement(self, text: str, start: int, key: str) -> str:
+        replacement = self.rules[key]
+        if text[start].isupper():
+            return replacement[:1].upper() + replacement[1:]
+        return replacement
+
+    def rewrite(self, text: str) -> str:
+        if self._pattern is None:
+            return text
+        out = []
+        pos = 0
+        for start, end, key in self._matches(text):
+            out.append(text[pos:start])
+            out.append(self._replacement(text, start, key))
+            pos = end
+        if pos == 0:
+            return text
+        out.append(text[pos:])
+        return "".join(out)
+
+    def stream(self) -> "StreamRewriter":
+        return StreamRewriter(self)
+
+    def rewrite_chunks(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Rewrite an iterable of text chunks, yielding rewritten chunks"""
+        streamer = self.stream()
+        for chunk in chunks:
+            out = streamer.feed(chunk)
+            if out:
+                yield out
+        tail = streamer.flush()
+        if tail:
+            yield tail
+
+
+class StreamRewriter:
+    """
+    Rewrites a token stream chunk by chunk.
+
+    Holds back at most `max_phrase_length - 1` characters, which is enough
+    for any phrase split across chunks to be seen whole before it is emitted.
+    """
+
+    def __init__(self, rewriter: ReplyRewriter):
+        self._rewriter = rewriter
+        self._hold = max(rewriter.max_phrase_length - 1, 0)
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        buffer = self._buffer + chunk
+        if self._rewriter._pattern is None:
+            self._buffer = ""
+            return buffer
+        # Any match starting before `cut` lies entirely inside the buffer
+        cut = len(buffer) - self._hold
+        if cut <= 0:
+            self._buffer = buffer
+            return ""
+        out = []
+        pos = 0
+        for start, end, key in self._rewriter._matches(buffer):
+            if start >= cut:
+                break
+            out.append(buffer[pos:start])
+            out.append(self._rewriter._replacement(buffer, start, key))
+            pos = end
+        if pos < cut:
+            out.append(buffer[pos:cut])
+            pos = cut
+        self._buffer = buffer[pos:]
+        return "".join(out)
+
+    def flush(self) -> str:
+        tail = self._rewriter.rewrite(self._buffer)
+        self._buffer = ""
+        return tail
+
+
+reply_rewriter = ReplyRewriter(load_replacement_rules())
+
+
+def benchmark(reply_chars: int = 20000, rounds: int = 200) -> Dict[str, float]:
+    """
+    Microseconds per reply for the old sequential str.replace (case-sensitive,
+    so not equivalent), a case-insensitive re.sub per phrase, and the
+    compiled rewriter on whole replies and on a 7-character token stream.
+    """
+    paragraph = (
+        "Mortgage insurance protects the lender if you stop paying. For exact numbers, talk to a lender "
+        "or consult your bank about your options, and compare offers before you lock a rate. "
+    )
+    reply = (paragraph * (reply_chars // len(paragraph) + 1))[:reply_chars]
+    rules = reply_rewriter.rules
+
+    def sequential(text: str) -> str:
+        for phrase, replacement in rules.items():
+            text = text.replace(phrase, replacement)
+        return text
+
+    def sequential_ignorecase(text: str) -> str:
+        for phrase, replacement in rules.items():
+            text = re.sub(re.escape(phrase), replacement, text, flags=re.IGNORECASE)
+        return text
+
+    chunks = [reply[i:i + 7] for i in range(0, len(reply), 7)]
+    candidates = [
+        ("str_replace", lambda: sequential(reply)),
+        ("re_sub_ignorecase_per_phrase", lambda: sequential_ignorecase(reply)),
+        ("rewriter", lambda: reply_rewriter.rewrite(reply)),
+        ("rewriter_stream_7_char_chunks", lambda: "".join(reply_rewriter.rewrite_chunks(chunks))),
+    ]
+    results = {}
+    for name, func in candidates:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        results[name] = round((time.perf_counter() - start) / rounds * 1e6, 1)
+    return results
+
+
+if __name__ == "__main__":
+    print(benchmark())
@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Response
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Bump when calculator output changes so old ETags stop matching
+RESULT_CACHE_VERSION = "2"
+
+
+def canonical_hash(namespace: str, payload, **params) -> str:
+    """SHA-256 of the inputs with sorted keys, so equal payloads hash alike whatever their field order"""
+    if hasattr(payload, "model_dump"):
+        payload = payload.model_dump()
+    canonical = json.dumps(
+        {"v": RESULT_CACHE_VERSION, "ns": namespace, "payload": payload, "params": params},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header lists this ETag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+class ResultCache:
+    """
+    LRU cache of serialized calculator responses, keyed by canonical_hash.
+
+    Calculator endpoints are pure functions of their inputs, so a repeated
+    payload is served from memory and an If-None-Match with the same ETag
+    is answered with 304. The cache is capped by the total size of the
+    stored bodies rather than by entry count.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Response]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        body, media_type = entry
+        return Response(content=body, media_type=media_type, headers={"ETag": etag_for(key)})
+
+    def set(self, key: str, body: bytes, media_type: str = "application/json") -> Response:
+        """Store a body and return it as a response carrying its ETag"""
+        if len(body) <= self.max_bytes:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[0])
+            self._entries[key] = (body, media_type)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+        return Response(content=body, media_type=media_type, headers={"ETag": etag_for(key)})
+
+    def revalidated(self) -> None:
+        """Count a 304 answered from the ETag alone"""
+        self.not_modified += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+result_cache = ResultCache()
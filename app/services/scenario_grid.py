@@ -0,0 +1,79 @@
+import os
+import logging
+from typing import Dict, List, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.amortization_engine import amortize_batch, level_payment
+from app.services.compute_pool import compute_pool
+from app.services.extra_payments import compile_extra_payments
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Grids with at least this many scenarios are split across the compute pool
+SCENARIO_POOL_THRESHOLD = int(os.getenv("SCENARIO_POOL_THRESHOLD", "2000"))
+SCENARIO_GRID_MAX_SIZE = int(os.getenv("SCENARIO_GRID_MAX_SIZE", "20000"))
+# Rows per batched pass; bounds the (rows x months) working arrays
+SCENARIO_BATCH_ROWS = 256
+
+
+def compile_plans(plans: Sequence, start_month: int, start_year: int, horizon: int):
+    """
+    Each extra-payment plan as a (fixed, per-payment) pair of month vectors.
+
+    Calendars are linear in the scheduled payment, so compiling with a
+    payment of 0 and of 1 separates the part that scales with it
+    (bi-weekly equivalents) from fixed amounts.
+    """
+    fixed = np.array([
+        compile_extra_payments(plan, start_month, start_year, horizon, scheduled_payment=0).amounts
+        for plan in plans
+    ]).reshape(len(plans), horizon)
+    per_payment = np.array([
+        compile_extra_payments(plan, start_month, start_year, horizon, scheduled_payment=1).amounts
+        for plan in plans
+    ]).reshape(len(plans), horizon) - fixed
+    return fixed, per_payment
+
+
+def evaluate_scenarios(loan_amounts: np.ndarray, annual_rates: np.ndarray, term_years: np.ndarray,
+                       plan_index: np.ndarray, plan_fixed: np.ndarray, plan_per_payment: np.ndarray) -> Dict[str, np.ndarray]:
+    """Summary figures for every scenario, plus the interest of the same loan without extras"""
+    results: Dict[str, List[np.ndarray]] = {}
+    for start in range(0, len(loan_amounts), SCENARIO_BATCH_ROWS):
+        rows = slice(start, start + SCENARIO_BATCH_ROWS)
+        batch = amortize_batch(
+            loan_amounts[rows], annual_rates[rows], term_years[rows],
+            plan_fixed[plan_index[rows]], plan_per_payment[plan_index[rows]]
+        )
+        for name, values in batch.items():
+            results.setdefault(name, []).append(values)
+    combined = {name: np.concatenate(values) for name, values in results.items()}
+
+    # A level-payment loan without extras pays exactly payment * months
+    payments = np.asarray(level_payment(loan_amounts, annual_rates, term_years), dtype=float).reshape(-1)
+    combined["interest_without_extras"] = payments * term_years * 12 - loan_amounts
+    return combined
+
+
+async def run_scenarios(loan_amounts: np.ndarray, annual_rates: np.ndarray, term_years: np.ndarray,
+                        plan_index: np.ndarray, plan_fixed: np.ndarray, plan_per_payment: np.ndarray) -> Dict[str, np.ndarray]:
+    """evaluate_scenarios, split across the compute pool for large grids and off the event loop for small ones"""
+    count = len(loan_amounts)
+    if count < SCENARIO_POOL_THRESHOLD:
+        return await run_in_threadpool(
+            evaluate_scenarios, loan_amounts, annual_rates, term_years, plan_index, plan_fixed, plan_per_payment
+        )
+
+    bounds = np.linspace(0, count, compute_pool.workers + 1).astype(int)
+    chunks = [
+        (loan_amounts[lo:hi], annual_rates[lo:hi], term_years[lo:hi], plan_index[lo:hi], plan_fixed, plan_per_payment)
+        for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+    ]
+    logger.info(f"Evaluating {count} scenarios in {len(chunks)} pool tasks")
+    parts = await compute_pool.map(evaluate_scenarios, chunks)
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
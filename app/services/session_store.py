@@ -0,0 +1,236 @@
+import os
+import copy
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+# How often the in-memory backend drops abandoned sessions, checked on write
+SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+
+
+class SessionConflictError(Exception):
+    """Raised when a session was changed by another request since it was read"""
+    pass
+
+
+def new_preapproval_state(started: bool = False) -> dict:
+    """Blank pre-approval wizard state"""
+    return {
+        "preapproval_started": started,
+        "current_question_index": 0,
+        "answers": {},
+        "uploaded_files": []
+    }
+
+
+class PreApprovalSession:
+    """A loaded session; `state` may be mutated in place and is saved on exit"""
+
+    def __init__(self, key: str, state: dict, version: int, exists: bool):
+        self.key = key
+        self.state = state
+        self.version = version
+        self.exists = exists
+        self.deleted = False
+        self._snapshot = copy.deepcopy(state)
+
+    @property
+    def dirty(self) -> bool:
+        return self.state != self._snapshot
+
+    def reset(self, state: Optional[dict] = None) -> None:
+        self.state = state if state is not None else new_preapproval_state()
+
+    def delete(self) -> None:
+        self.deleted = True
+
+
+class SessionStore:
+    """
+    Versioned pre-approval session storage.
+
+    Writes carry the version that was read and fail with SessionConflictError
+    if another worker saved the session in the meantime. Sessions untouched
+    for `ttl_seconds` expire. Backends whose calls block (`blocking`) are run
+    in a worker thread so the event loop never waits on them.
+    """
+
+    blocking = False
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+
+    def _read(self, key: str) -> Optional[Tuple[dict, int]]:
+        raise NotImplementedError
+
+    def _write(self, key: str, state: dict, expected_version: int) -> int:
+        raise NotImplementedError
+
+    def _remove(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def _call(self, method, *args):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def peek(self, key: str) -> Optional[dict]:
+        """Current state for a key, or None if there is no live session"""
+        record = await self._call(self._read, key)
+        return record[0] if record else None
+
+    async def load(self, key: str) -> PreApprovalSession:
+        record = await self._call(self._read, key)
+        if record is None:
+            return PreApprovalSession(key, new_preapproval_state(), 0, exists=False)
+        state, version = record
+        return PreApprovalSession(key, state, version, exists=True)
+
+    async def save(self, session: PreApprovalSession) -> None:
+        if session.deleted:
+            if session.exists:
+                await self._call(self._remove, session.key)
+            return
+        if not session.dirty:
+            return
+        await self._call(self._write, session.key, session.state, session.version)
+
+    @asynccontextmanager
+    async def session(self, key: str) -> AsyncIterator[PreApprovalSession]:
+        """Load a session and save it when the block finishes without raising"""
+        session = await self.load(key)
+        yield session
+        await self.save(session)
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local backend; only correct when running a single worker"""
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS, sweep_seconds: float = SESSION_SWEEP_SECONDS):
+        super().__init__(ttl_seconds=ttl_seconds)
+        self.sweep_seconds = sweep_seconds
+        self._sessions: Dict[str, Tuple[dict, int, float]] = {}
+        self._swept_at = time.monotonic()
+
+    def _sweep(self, now: float) -> None:
+        """Drop sessions nobody has touched for ttl_seconds, even if they are never read again"""
+        if now - self._swept_at < self.sweep_seconds:
+            return
+        expired = [key for key, (_, _, updated_at) in self._sessions.items() if now - updated_at > self.ttl_seconds]
+        for key in expired:
+            del self._sessions[key]
+        if expired:
+            logger.info(f"Expired {len(expired)} abandoned sessions")
+        self._swept_at = now
+
+    def _read(self, key: str) -> Optional[Tuple[dict, int]]:
+        record = self._sessions.get(key)
+        if record is None:
+            return None
+        state, version, updated_at = record
+        if time.monotonic() - updated_at > self.ttl_seconds:
+            del self._sessions[key]
+            return None
+        return copy.deepcopy(state), version
+
+    def _write(self, key: str, state: dict, expected_version: int) -> int:
+        current = self._sessions.get(key)
+        current_version = current[1] if current else 0
+        if current_version != expected_version:
+            raise SessionConflictError(f"Session {key} was modified concurrently")
+        version = expected_version + 1
+        now = time.monotonic()
+        self._sessions[key] = (copy.deepcopy(state), version, now)
+        self._sweep(now)
+        return version
+
+    def _remove(self, key: str) -> None:
+        self._sessions.pop(key, None)
+
+
+class MongoSessionStore(SessionStore):
+    """
+    Shared backend so every worker sees the same wizard progress. Every load
+    reads Mongo; a local cache would hand out versions another worker has
+    already replaced and turn the next save into a spurious conflict.
+    """
+
+    blocking = True
+
+    def __init__(self, collection, namespace: str, ttl_seconds: int = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds=ttl_seconds)
+        self.collection = collection
+        self.namespace = namespace
+        self._index_ready = False
+
+    def _id(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _ensure_index(self) -> None:
+        if self._index_ready:
+            return
+        try:
+            self.collection.create_index("updated_at", expireAfterSeconds=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Could not create session TTL index: {e}")
+        self._index_ready = True
+
+    def _read(self, key: str) -> Optional[Tuple[dict, int]]:
+        self._ensure_index()
+        doc = self.collection.find_one({"_id": self._id(key)})
+        if doc is None:
+            return None
+        # Mongo's TTL monitor only runs periodically, so expire eagerly as well
+        if doc["updated_at"] < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+            self.collection.delete_one({"_id": doc["_id"], "version": doc["version"]})
+            return None
+        return doc["state"], doc["version"]
+
+    def _write(self, key: str, state: dict, expected_version: int) -> int:
+        self._ensure_index()
+        version = expected_version + 1
+        if expected_version == 0:
+            try:
+                self.collection.insert_one({
+                    "_id": self._id(key),
+                    "state": state,
+                    "version": version,
+                    "updated_at": datetime.utcnow()
+                })
+            except DuplicateKeyError:
+                raise SessionConflictError(f"Session {key} was created concurrently")
+            return version
+        result = self.collection.update_one(
+            {"_id": self._id(key), "version": expected_version},
+            {"$set": {"state": state, "version": version, "updated_at": datetime.utcnow()}}
+        )
+        if result.matched_count == 0:
+            raise SessionConflictError(f"Session {key} was modified concurrently")
+        return version
+
+    def _remove(self, key: str) -> None:
+        self.collection.delete_one({"_id": self._id(key)})
+
+
+def create_session_store(namespace: str) -> SessionStore:
+    """Build the backend selected by SESSION_STORE_BACKEND ("memory" or "mongo")"""
+    if SESSION_STORE_BACKEND == "mongo":
+        from app.database import preapproval_sessions_collection
+        return MongoSessionStore(preapproval_sessions_collection, namespace)
+    return InMemorySessionStore()
+
+
+chat_sessions = create_session_store("chat")
+user_chat_sessions = create_session_store("user_chat")
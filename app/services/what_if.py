@@ -0,0 +1,197 @@
+import os
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.services.amortization_engine import AmortizationSchedule, level_payment, segment_rows
+from app.services.extra_payments import compile_extra_payments
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WHAT_IF_MAX_PLANS = int(os.getenv("WHAT_IF_MAX_PLANS", "2000"))
+
+EXTRA = "extra"
+RATE = "rate"
+RECAST = "recast"
+MODIFICATIONS = (EXTRA, RATE, RECAST)
+
+
+class PaymentPlan:
+    """
+    A computed schedule plus what is needed to recompute it from any month.
+
+    Modifications are layered: the requested extra payments per month,
+    rate changes by month and the months at which the payment is
+    re-amortized over the rest of the original term. `modify()` keeps the
+    rows before the changed month and recomputes only the rest, honouring
+    any later modifications already in the plan.
+    """
+
+    def __init__(self, loan_amount: float, annual_rate: float, term_months: int, start_month: int,
+                 start_year: int, extra: np.ndarray, rate_changes: Dict[int, float],
+                 reamortize: FrozenSet[int], parent: Optional["PaymentPlan"] = None, from_payment: int = 0):
+        self.loan_amount = loan_amount
+        self.annual_rate = annual_rate
+        self.term_months = term_months
+        self.start_month = start_month
+        self.start_year = start_year
+        self.extra = extra
+        self.rate_changes = rate_changes
+        self.reamortize = reamortize
+        self.schedule, self.annual_rates = self._build(parent, from_payment)
+
+    @classmethod
+    def create(cls, loan_amount: float, annual_rate: float, term_years: int, start_month: int, start_year: int,
+               extra_payments=None) -> "PaymentPlan":
+        horizon = term_years * 12 * 2
+        payment = float(level_payment(loan_amount, annual_rate, term_years))
+        extra = compile_extra_payments(extra_payments, start_month, start_year, horizon,
+                                       scheduled_payment=payment).amounts
+        return cls(loan_amount, annual_rate, term_years * 12, start_month, start_year, extra, {}, frozenset())
+
+    def _build(self, parent: Optional["PaymentPlan"], start: int):
+        if parent is None:
+            start = 0
+            balance = self.loan_amount
+            annual_rate = self.annual_rate
+            payment = float(level_payment(balance, annual_rate, self.term_months / 12))
+            prefix = None
+        else:
+            base = parent.schedule
+            balance = float(base.beginning_balance[start])
+            annual_rate = float(parent.annual_rates[start])
+            payment = float(base.scheduled_payment[start])
+            prefix = (base.beginning_balance[:start], base.extra[:start], base.principal[:start],
+                      base.interest[:start], base.ending_balance[:start], base.scheduled_payment[:start],
+                      parent.annual_rates[:start])
+
+        boundaries = sorted(m for m in set(self.rate_changes) | self.reamortize if m > start)
+        pieces = []
+        position = start
+        for end in boundaries + [len(self.extra)]:
+            if position in self.rate_changes:
+                annual_rate = self.rate_changes[position]
+            if position in self.rate_changes or position in self.reamortize:
+                remaining_years = max(self.term_months - position, 1) / 12
+                payment = float(level_payment(balance, annual_rate, remaining_years))
+            paid_off, *columns = segment_rows(balance, annual_rate / 100 / 12, payment, self.extra[position:end])
+            count = len(columns[0])
+            pieces.append((*columns, np.full(count, payment), np.full(count, annual_rate)))
+            if paid_off or not count:
+                break
+            balance = float(columns[4][-1])
+            position = end
+
+        if prefix is not None:
+            pieces.insert(0, prefix)
+        beginning, extra, principal, interest, ending, scheduled, rates = (
+            np.concatenate(parts) for parts in zip(*pieces)
+        )
+        first_payment = float(scheduled[0]) if len(scheduled) else 0.0
+        schedule = AmortizationSchedule(
+            first_payment, self.start_month, self.start_year, beginning, extra, principal, interest, ending,
+            scheduled_payment=scheduled
+        )
+        return schedule, rates
+
+    def modify(self, kind: str, payment_number: int, amount: float = 0, annual_rate: Optional[float] = None,
+               recurring: bool = False) -> "PaymentPlan":
+        """
+        New plan with one modification effective at `payment_number` (1-based):
+        - extra: `amount` extra at that payment (every payment after it too if `recurring`)
+        - rate: `annual_rate` from that payment on, payment re-amortized over the remaining term
+        - recast: lump sum `amount` at that payment, payment re-amortized from the next one
+        """
+        if kind not in MODIFICATIONS:
+            raise ValueError(f"Unknown modification {kind!r}")
+        start = payment_number - 1
+        if not 0 <= start < len(self.schedule):
+            raise ValueError(f"Payment {payment_number} is outside the schedule (1-{len(self.schedule)})")
+
+        extra = self.extra
+        rate_changes = self.rate_changes
+        reamortize = self.reamortize
+        if kind in (EXTRA, RECAST):
+            if amount <= 0:
+                raise ValueError("Amount must be positive")
+            extra = extra.copy()
+            if kind == EXTRA and recurring:
+                extra[start:] += amount
+            else:
+                extra[start] += amount
+            if kind == RECAST:
+                reamortize = reamortize | {start + 1}
+        else:
+            if annual_rate is None or annual_rate < 0:
+                raise ValueError("A rate change needs a non-negative interestRate")
+            rate_changes = {**rate_changes, start: annual_rate}
+
+        return PaymentPlan(
+            self.loan_amount, self.annual_rate, self.term_months, self.start_month, self.start_year,
+            extra, rate_changes, reamortize, parent=self, from_payment=start
+        )
+
+    def summary(self) -> dict:
+        schedule = self.schedule
+        return {
+            "monthlyPayment": schedule.monthly_payment,
+            "finalScheduledPayment": float(schedule.scheduled_payment[-1]),
+            "totalPayments": schedule.total_payments,
+            "totalInterest": schedule.total_interest,
+            "paymentCount": len(schedule),
+            "payoffDate": schedule.payoff_date(),
+        }
+
+    def diff(self, base: "PaymentPlan") -> dict:
+        """Change of this plan against `base`"""
+        ours, theirs = self.schedule, base.schedule
+        common = min(len(ours), len(theirs))
+        changed = np.flatnonzero(
+            (ours.principal[:common] != theirs.principal[:common]) | (ours.extra[:common] != theirs.extra[:common])
+        )
+        first_changed = int(changed[0]) + 1 if len(changed) else (common + 1 if len(ours) != len(theirs) else None)
+        return {
+            "firstChangedPayment": first_changed,
+            "interestDelta": ours.total_interest - theirs.total_interest,
+            "totalPaymentsDelta": ours.total_payments - theirs.total_payments,
+            "paymentCountDelta": len(ours) - len(theirs),
+            "scheduledPaymentDelta": float(ours.scheduled_payment[-1] - theirs.scheduled_payment[-1]),
+        }
+
+
+class PlanStore:
+    """
+    Recently computed plans by handle, least recently used evicted first.
+
+    Handles live in this process only; a client whose handle has expired
+    recreates the base plan.
+    """
+
+    def __init__(self, max_plans: int = WHAT_IF_MAX_PLANS):
+        self.max_plans = max_plans
+        self._plans: "OrderedDict[str, PaymentPlan]" = OrderedDict()
+
+    def add(self, plan: PaymentPlan) -> str:
+        handle = uuid.uuid4().hex
+        self._plans[handle] = plan
+        while len(self._plans) > self.max_plans:
+            self._plans.popitem(last=False)
+        return handle
+
+    def get(self, handle: str) -> Optional[PaymentPlan]:
+        plan = self._plans.get(handle)
+        if plan is not None:
+            self._plans.move_to_end(handle)
+        return plan
+
+    def stats(self) -> Dict[str, int]:
+        return {"plans": len(self._plans), "max_plans": self.max_plans}
+
+
+plan_store = PlanStore()
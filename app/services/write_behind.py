@@ -0,0 +1,129 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "100"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.05"))
+WRITE_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "5000"))
+
+_Item = Tuple[object, dict, Optional[asyncio.Future]]
+
+
+class WriteBehindQueue:
+    """
+    Buffers Mongo inserts off the request path and flushes them with insert_many.
+
+    A batch is flushed when it reaches `batch_size` documents or
+    `flush_interval` seconds after its first document, whichever comes first.
+    The queue holds at most `max_pending` documents; once it is full, writers
+    wait, which pushes back on callers while Mongo is slow. Callers that must
+    know a document is stored pass durable=True and wait for its batch.
+    """
+
+    def __init__(self, batch_size: int = WRITE_BATCH_SIZE, flush_interval: float = WRITE_FLUSH_INTERVAL,
+                 max_pending: int = WRITE_MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._worker = asyncio.create_task(self._run())
+        logger.info("Write-behind queue started")
+
+    async def stop(self) -> None:
+        """Flush everything still queued, then stop the worker"""
+        if not self.running:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        logger.info(f"Write-behind queue drained ({self.written} documents written)")
+
+    async def write(self, collection, document: dict, durable: bool = False) -> None:
+        """Queue a document for insertion; with durable=True wait until it is stored"""
+        if not self.running:
+            # No running loop worker (e.g. scripts or tests): write straight through
+            await asyncio.to_thread(collection.insert_one, document)
+            return
+        future = asyncio.get_running_loop().create_future() if durable else None
+        await self._queue.put((collection, document, future))
+        if future is not None:
+            await future
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "max_pending": self.max_pending,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[_Item] = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[_Item]) -> None:
+        by_collection: Dict[int, List[_Item]] = {}
+        for item in batch:
+            by_collection.setdefault(id(item[0]), []).append(item)
+        for items in by_collection.values():
+            collection = items[0][0]
+            documents = [document for _, document, _ in items]
+            try:
+                await asyncio.to_thread(collection.insert_many, documents, ordered=False)
+                self.written += len(documents)
+                error = None
+            except Exception as e:
+                logger.error(f"Write-behind flush of {len(documents)} documents failed: {e}")
+                self.failed += len(documents)
+                error = e
+            self.batches += 1
+            for _, _, future in items:
+                if future is None or future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+
+write_behind = WriteBehindQueue()
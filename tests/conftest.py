@@ -0,0 +1,5 @@
+import os
+
+# app.database refuses to import without a Mongo URL; MongoClient connects lazily,
+# so tests that never touch the database run without a server
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/?serverSelectionTimeoutMS=200")
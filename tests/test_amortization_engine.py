@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from app.models import ExtraPaymentRule
+from app.routes.amortization_routes import (
+    ExtraPaymentDetails,
+    ExtraPayments,
+    OneTimePayment,
+    generate_amortization_schedule,
+)
+from app.services.amortization_engine import amortize, amortize_cents
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+LOAN_COUNT = 300
+# Cents the cent engine may drift from the float loop per month: half a cent
+# each from rounding the payment, the interest and the extra payment
+CENT_DRIFT_PER_MONTH = 0.015
+
+
+def random_loan(rng: np.random.Generator, number: int) -> dict:
+    """Loan terms for the reference loop; every tenth loan is at 0% and two in three have extra payments"""
+    start_year = int(rng.integers(2020, 2030))
+    extra_payments = ExtraPayments()
+    if number % 3:
+        extra_payments = ExtraPayments(
+            monthly=ExtraPaymentDetails(
+                amount=float(rng.choice([0, 50, 250.5])),
+                fromMonth=MONTHS[rng.integers(12)],
+                fromYear=start_year + int(rng.integers(0, 3)),
+            ),
+            yearly=ExtraPaymentDetails(
+                amount=float(rng.choice([0, 1000, 5000])),
+                fromMonth=MONTHS[rng.integers(12)],
+                fromYear=start_year,
+            ),
+            oneTime=[OneTimePayment(
+                amount=float(rng.uniform(0, 100_000)),
+                month=MONTHS[rng.integers(12)],
+                year=start_year + int(rng.integers(0, 5)),
+            )],
+            rules=[ExtraPaymentRule(
+                amount=float(rng.uniform(0, 300)),
+                fromMonth=int(rng.integers(1, 13)),
+                fromYear=start_year,
+                everyMonths=int(rng.integers(1, 7)),
+                annualIncreasePercent=float(rng.choice([0, 3])),
+                biweekly=number % 4 == 0,
+            )],
+        )
+    return {
+        "loan_amount": float(np.round(rng.uniform(1_000, 1_500_000), 2)),
+        "annual_rate": 0.0 if number % 10 == 0 else float(np.round(rng.uniform(0.125, 12), 3)),
+        "term_years": int(rng.choice([1, 5, 10, 15, 20, 25, 30, 40])),
+        "start_month": MONTHS[rng.integers(12)],
+        "start_year": start_year,
+        "extra_payments": extra_payments,
+    }
+
+
+def random_loans():
+    rng = np.random.default_rng(11)
+    return [random_loan(rng, number) for number in range(LOAN_COUNT)]
+
+
+LOANS = random_loans()
+
+
+def reference(loan: dict):
+    result = generate_amortization_schedule(start_date="", **loan)
+    columns = {
+        name: np.array([getattr(item, name) for item in result.schedule])
+        for name in ("interest", "principal", "extraPayment", "endingBalance")
+    }
+    return result, columns
+
+
+def engine_arguments(loan: dict) -> dict:
+    return {**loan, "start_month": MONTHS.index(loan["start_month"]) + 1}
+
+
+@pytest.mark.parametrize("loan", LOANS)
+def test_numpy_engine_matches_loop(loan):
+    result, expected = reference(loan)
+    schedule = amortize(**engine_arguments(loan))
+
+    assert len(schedule) == len(result.schedule)
+    assert schedule.payoff_date() == result.payoffDate
+    assert schedule.payment_dates() == [item.paymentDate for item in result.schedule]
+    # Payments near payoff are tiny, so differences are measured against the loan
+    tolerance = {"rtol": 1e-9, "atol": loan["loan_amount"] * 1e-9}
+    np.testing.assert_allclose(schedule.monthly_payment, result.monthlyPayment, **tolerance)
+    np.testing.assert_allclose(schedule.interest, expected["interest"], **tolerance)
+    np.testing.assert_allclose(schedule.principal, expected["principal"], **tolerance)
+    np.testing.assert_allclose(schedule.extra, expected["extraPayment"], **tolerance)
+    np.testing.assert_allclose(schedule.ending_balance, expected["endingBalance"], **tolerance)
+    np.testing.assert_allclose(schedule.total_interest, result.totalInterest, **tolerance)
+
+
+@pytest.mark.parametrize("loan", LOANS)
+def test_cent_engine_matches_loop_within_rounding(loan):
+    result, expected = reference(loan)
+    schedule = amortize_cents(**engine_arguments(loan))
+
+    assert len(schedule) == len(result.schedule)
+    assert schedule.payoff_date() == result.payoffDate
+    assert abs(schedule.monthly_payment - result.monthlyPayment) <= 0.005
+    assert schedule.ending_balance[-1] == 0
+
+    # Rounding differences compound at the loan rate, so the allowed gap
+    # after payment k is the drift of k months of per-month rounding
+    monthly_rate = loan["annual_rate"] / 100 / 12
+    elapsed = np.arange(1, len(schedule) + 1)
+    if monthly_rate == 0:
+        drift = CENT_DRIFT_PER_MONTH * elapsed
+    else:
+        drift = CENT_DRIFT_PER_MONTH * ((1 + monthly_rate) ** elapsed - 1) / monthly_rate
+    opening_drift = np.r_[0.0, drift[:-1]]
+
+    assert np.all(np.abs(schedule.ending_balance - expected["endingBalance"]) <= drift)
+    assert np.all(np.abs(schedule.interest - expected["interest"]) <= 0.005 + monthly_rate * opening_drift + 1e-9)
+    assert np.all(np.abs(schedule.principal - expected["principal"]) <= opening_drift + drift)
+    assert abs(schedule.total_interest - result.totalInterest) <= 0.005 * len(schedule) + monthly_rate * drift.sum()
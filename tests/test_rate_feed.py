@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.services.rate_feed import MortgageRateFeed, parse_rates_html
+
+FIXTURE = Path(__file__).parent / "fixtures" / "mortgage_news_daily_rates.html"
+
+
+class FakeCollection:
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update))
+
+
+def make_feed(pages):
+    """A feed whose fetches parse `pages` in order, persisting to a fake collection"""
+    feed = MortgageRateFeed()
+    feed.collection = FakeCollection()
+    pages = iter(pages)
+
+    async def fetch():
+        return parse_rates_html(next(pages))
+
+    feed.fetch = fetch
+    return feed
+
+
+def test_parse_rates_html_reads_mtg_rates_table():
+    rates = parse_rates_html(FIXTURE.read_bytes())
+
+    assert rates == {
+        "30 Yr. Fixed": "6.27%",
+        "15 Yr. Fixed": "5.79%",
+        "30 Yr. FHA": "5.91%",
+        "30 Yr. Jumbo": "6.41%",
+        "7/6 SOFR ARM": "5.95%",
+        "30 Yr. VA": "5.92%",
+    }
+
+
+def test_parse_rates_html_changed_layout_returns_nothing():
+    page = FIXTURE.read_bytes().replace(b"mtg-rates", b"rate-product-table")
+
+    assert parse_rates_html(page) == {}
+
+
+def test_refresh_keeps_last_good_snapshot_when_layout_changes():
+    good = FIXTURE.read_bytes()
+    feed = make_feed([good, good.replace(b"mtg-rates", b"rate-product-table")])
+
+    asyncio.run(feed.refresh())
+    fetched_at = feed.fetched_at
+    assert fetched_at is not None
+    assert datetime.utcnow() - fetched_at < timedelta(minutes=1)
+    assert feed.value["30 Yr. Fixed"] == "6.27%"
+    assert len(feed.collection.updates) == 1
+
+    asyncio.run(feed.refresh())
+    assert feed.value == parse_rates_html(good)
+    assert feed.fetched_at == fetched_at
+    assert feed.last_error == "fetch returned no usable data"
+    assert len(feed.collection.updates) == 1
+
+
+def test_formatted_shows_rates_and_as_of_date():
+    feed = make_feed([FIXTURE.read_bytes()])
+    asyncio.run(feed.refresh())
+
+    text = feed.formatted()
+
+    assert text.startswith("30 Yr. Fixed: 6.27%\n15 Yr. Fixed: 5.79%\n")
+    assert text.endswith(f"as of {feed.fetched_at.strftime('%b %d, %Y %H:%M UTC')}")
+    assert "Mortgage News Daily (https://www.mortgagenewsdaily.com/mortgage-rates)" in text